@@ -20,6 +20,7 @@ from uvtypes import UVTriangle
 from meshtypes import Vertex
 from meshtypes import Edge
 from meshtypes import Face
+from meshtypes import as_indexed_mesh
 
 #obsolete?
 def calculate_normal(plane: Plane) -> np.ndarray:
@@ -74,6 +75,346 @@ def dist_point_plane(point: Point, plane: Plane) -> float:
     dist = num / np.linalg.norm(pl_norm)
     return dist
 
+def dist_point_edge(point: Point, edge: Edge) -> float:
+    """Calculates the distance between a point and an edge (line segment) in 3D space.
+    ARGS:
+        point (Point): Point in 3D space
+        edge (Edge): Edge in 3D space delimited by 2 vertices
+    RETURNS:
+        dist(float): scalar minimum distance between point and edge
+    """
+    dist, _ = closest_point_segment(point.coords, edge.vertex_a.coords, edge.vertex_b.coords)
+    return float(dist[0])
+
+def dist_point_face(point: Point, face: Face) -> float:
+    """Calculates the distance between a point and a triangular face in 3D space.
+    ARGS:
+        point (Point): Point in 3D space
+        face (Face): Face in 3D space delimited by 3 vertices
+    RETURNS:
+        dist(float): scalar minimum distance between point and face
+    """
+    dist, _ = closest_point_triangle(point.coords, face.vertex_a.coords, face.vertex_b.coords, face.vertex_c.coords)
+    return float(dist[0])
+
+def closest_point_segment(points, seg_a: np.ndarray, seg_b: np.ndarray) -> tuple:
+    """Calculates the closest points on line segments for a batch of points.
+    ARGS:
+        points: query points, ndarray of shape (N, 3) or list of Point objects
+        seg_a, seg_b (np.ndarray): segment end points of shape (N, 3), or (3,) for a single segment
+    RETURNS:
+        dist (np.ndarray): minimum distances of shape (N,)
+        closest (np.ndarray): closest points on the segments of shape (N, 3)
+    """
+    p = utility.vec_array(points)
+    a = np.asarray(seg_a, dtype=float)
+    ab = np.asarray(seg_b, dtype=float) - a
+    num = np.sum((p - a) * ab, axis=-1)
+    den = np.sum(ab * ab, axis=-1)
+    # degenerated segments collapse to their first end point
+    t = np.clip(np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den > 0), 0.0, 1.0)
+    closest = a + t[..., None] * ab
+    dist = np.linalg.norm(p - closest, axis=-1)
+    return dist, closest
+
+def closest_point_triangle(points, tri_a: np.ndarray, tri_b: np.ndarray, tri_c: np.ndarray) -> tuple:
+    """Calculates the closest points on triangles for a batch of points.
+    Every point is classified into the Voronoi region (vertex, edge or face) of its triangle it lies in.
+    ARGS:
+        points: query points, ndarray of shape (N, 3) or list of Point objects
+        tri_a, tri_b, tri_c (np.ndarray): triangle vertices of shape (N, 3), or (3,) for a single triangle
+    RETURNS:
+        dist (np.ndarray): minimum distances of shape (N,)
+        closest (np.ndarray): closest points on the triangles of shape (N, 3)
+    """
+    p = utility.vec_array(points)
+    a, b, c = [np.broadcast_to(np.asarray(t, dtype=float), p.shape) for t in (tri_a, tri_b, tri_c)]
+    dot = lambda u, v: np.einsum('ij,ij->i', u, v)
+    ab, ac, bc = b - a, c - a, c - b
+    ap, bp, cp = p - a, p - b, p - c
+    d1, d2 = dot(ab, ap), dot(ac, ap)
+    d3, d4 = dot(ab, bp), dot(ac, bp)
+    d5, d6 = dot(ab, cp), dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # regions are assigned in reverse order of precedence, so that prior regions overwrite later ones
+        denom = va + vb + vc
+        closest = a + ab * (vb / denom)[:, None] + ac * (vc / denom)[:, None]
+        region = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+        closest[region] = (b + bc * ((d4 - d3) / ((d4 - d3) + (d5 - d6)))[:, None])[region]
+        region = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        closest[region] = (a + ac * (d2 / (d2 - d6))[:, None])[region]
+        region = (d6 >= 0) & (d5 <= d6)
+        closest[region] = c[region]
+        region = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        closest[region] = (a + ab * (d1 / (d1 - d3))[:, None])[region]
+        region = (d3 >= 0) & (d4 <= d3)
+        closest[region] = b[region]
+        region = (d1 <= 0) & (d2 <= 0)
+        closest[region] = a[region]
+
+    # degenerated triangles without unique region fall back to their edges
+    invalid = ~np.all(np.isfinite(closest), axis=1)
+    if invalid.any():
+        p_i, a_i, b_i, c_i = p[invalid], a[invalid], b[invalid], c[invalid]
+        edge_res = [closest_point_segment(p_i, s0, s1) for s0, s1 in ((a_i, b_i), (b_i, c_i), (c_i, a_i))]
+        nearest = np.argmin(np.stack([d for d, _ in edge_res]), axis=0)
+        closest[invalid] = np.stack([cp for _, cp in edge_res])[nearest, np.arange(len(p_i))]
+    dist = np.linalg.norm(p - closest, axis=1)
+    return dist, closest
+
+def closest_point_mesh(points, mesh, chunk_size: int = 65536) -> tuple:
+    """Calculates the closest points on a triangle mesh for a batch of points.
+    Candidate faces are pruned with the bounding volume hierarchy of the mesh.
+    ARGS:
+        points: query points, ndarray of shape (N, 3) or list of Point objects
+        mesh: IndexedMesh or list of Face objects
+        chunk_size (int): number of point-node pairs processed at once, bounds memory use (default: 65536)
+    RETURNS:
+        dist (np.ndarray): unsigned minimum distances of shape (N,)
+        closest (np.ndarray): closest points on the mesh of shape (N, 3)
+        face_id (np.ndarray): index of the face the closest point lies on, shape (N,)
+    """
+    p = utility.vec_array(points)
+    mesh = as_indexed_mesh(mesh)
+    tri_a, tri_b, tri_c = mesh.corners
+
+    def face_dist(q, face_ids):
+        dist, closest = closest_point_triangle(q, tri_a[face_ids], tri_b[face_ids], tri_c[face_ids])
+        return dist * dist, closest
+
+    dist_sq, face_id, closest = mesh.tree.nearest(p, face_dist, chunk_size)
+    dist = np.sqrt(dist_sq)
+    return dist, closest, face_id
+
+def dist_line_line(line_0: Line, line_1: Line) -> float:
+    """Calculates the minimum distance between two lines in 3D space.
+    ARGS:
+        line_0, line_1 (Line): Lines in 3D space defined by 2 points
+    RETURNS:
+        dist (float): scalar minimum distance between both lines
+    """
+    dist, _, _, _, _ = closest_approach_lines((line_0.point_a, line_0.point_b), (line_1.point_a, line_1.point_b))
+    return float(dist[0])
+
+def dist_edge_edge(edge_0: Edge, edge_1: Edge) -> float:
+    """Calculates the minimum distance between two edges (line segments) in 3D space.
+    ARGS:
+        edge_0, edge_1 (Edge): Edges in 3D space delimited by 2 vertices
+    RETURNS:
+        dist (float): scalar minimum distance between both edges
+    """
+    dist, _, _, _, _ = closest_approach_segments((edge_0.vertex_a.coords, edge_0.vertex_b.coords),
+                                                 (edge_1.vertex_a.coords, edge_1.vertex_b.coords))
+    return float(dist[0])
+
+def _approach_params(p_0: np.ndarray, d_0: np.ndarray, p_1: np.ndarray, d_1: np.ndarray, clamp: bool,
+                     tolerance: float) -> tuple:
+    """Parameters of the closest points of lines p_0 + s * d_0 and p_1 + t * d_1, clamped to [0, 1] for segments.
+    Parallel pairs take s = 0, degenerated pairs collapse to their first point."""
+    dot = lambda u, v: np.sum(u * v, axis=-1)
+    r = p_0 - p_1
+    a, e, b = dot(d_0, d_0), dot(d_1, d_1), dot(d_0, d_1)
+    c, f = dot(d_0, r), dot(d_1, r)
+    clip = (lambda x: np.clip(x, 0.0, 1.0)) if clamp else (lambda x: x)
+    denom = a * e - b * b
+    # denom / (a * e) is the squared sine of the enclosed angle
+    parallel = denom <= tolerance * a * e
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = clip(np.where(parallel, 0.0, (b * f - c * e) / np.where(parallel, 1.0, denom)))
+        t = (b * s + f) / e
+        if clamp:
+            # s is recomputed for the clamped t, which yields the closest pair of segments
+            t_clamped = np.clip(t, 0.0, 1.0)
+            s = np.where(t_clamped != t, np.clip((b * t_clamped - c) / a, 0.0, 1.0), s)
+            t = t_clamped
+        tiny = np.finfo(float).tiny
+        point_1 = e <= tiny
+        s = np.where(point_1, clip(-c / a), s)
+        t = np.where(point_1, 0.0, t)
+        point_0 = a <= tiny
+        s = np.where(point_0, 0.0, s)
+        t = np.where(point_0, np.where(point_1, 0.0, clip(f / e)), t)
+    return s, t
+
+def _approach_inputs(seg_0: tuple, seg_1: tuple) -> tuple:
+    """Base points and direction vectors of two collections of lines or segments."""
+    p_0, q_0 = [utility.vec_array(v) for v in seg_0]
+    p_1, q_1 = [utility.vec_array(v) for v in seg_1]
+    return p_0, q_0 - p_0, p_1, q_1 - p_1
+
+def _approach_result(p_0: np.ndarray, d_0: np.ndarray, p_1: np.ndarray, d_1: np.ndarray, clamp: bool,
+                     return_points: bool, tolerance: float) -> tuple:
+    """Distances, parameters and optionally closest points for broadcast pairs of lines or segments."""
+    s, t = _approach_params(p_0, d_0, p_1, d_1, clamp, tolerance)
+    closest_0 = p_0 + s[..., None] * d_0
+    closest_1 = p_1 + t[..., None] * d_1
+    dist = np.linalg.norm(closest_0 - closest_1, axis=-1)
+    if not return_points:
+        closest_0 = closest_1 = None
+    return dist, s, t, closest_0, closest_1
+
+def closest_approach_blocks(seg_0: tuple, seg_1: tuple, segments: bool = True, return_points: bool = True,
+                            tolerance: float = 1e-12, chunk_size: int = 4194304):
+    """Calculates the closest approach of all combinations of two collections of lines or segments, one block of
+    rows at a time, so that memory use is bounded by chunk_size regardless of N * M.
+    ARGS:
+        seg_0, seg_1 (tuple): two points per line or segment, each of shape (N, 3) and (M, 3) respectively
+        segments (bool): treat the inputs as segments (default: True), otherwise as infinite lines
+        return_points (bool): calculate the closest points (default: True), otherwise they are None
+        tolerance (float): squared sine of the angle below which pairs are treated as parallel (default: 1e-12)
+        chunk_size (int): number of pairs per block (default: 4194304)
+    YIELDS:
+        start (int): index of the first row of the block in seg_0
+        dist, param_0, param_1 (np.ndarray): see closest_approach_segments, shape (K, M) for K rows
+        closest_0, closest_1 (np.ndarray): closest points of shape (K, M, 3), or None
+    """
+    p_0, d_0, p_1, d_1 = _approach_inputs(seg_0, seg_1)
+    rows = max(1, chunk_size // max(len(p_1), 1))
+    for start in range(0, len(p_0), rows):
+        sl = slice(start, start + rows)
+        yield (start,) + _approach_result(p_0[sl, None], d_0[sl, None], p_1[None], d_1[None], segments,
+                                          return_points, tolerance)
+
+def _closest_approach(seg_0: tuple, seg_1: tuple, clamp: bool, all_pairs: bool, return_points: bool,
+                      tolerance: float, chunk_size: int) -> tuple:
+    """Shared implementation of closest_approach_lines and closest_approach_segments."""
+    if not all_pairs:
+        return _approach_result(*_approach_inputs(seg_0, seg_1), clamp, return_points, tolerance)
+    n, m = len(utility.vec_array(seg_0[0])), len(utility.vec_array(seg_1[0]))
+    dist, s, t = np.empty((n, m)), np.empty((n, m)), np.empty((n, m))
+    closest_0, closest_1 = (np.empty((n, m, 3)), np.empty((n, m, 3))) if return_points else (None, None)
+    for start, *block in closest_approach_blocks(seg_0, seg_1, clamp, return_points, tolerance, chunk_size):
+        sl = slice(start, start + len(block[0]))
+        dist[sl], s[sl], t[sl] = block[:3]
+        if return_points:
+            closest_0[sl], closest_1[sl] = block[3:]
+    return dist, s, t, closest_0, closest_1
+
+def closest_approach_lines(line_0: tuple, line_1: tuple, all_pairs: bool = False, return_points: bool = True,
+                           tolerance: float = 1e-12, chunk_size: int = 4194304) -> tuple:
+    """Calculates the closest points between infinite lines, either for pairs of lines or for all combinations.
+    Lines are given by two points each, points on the lines are point_a + param * (point_b - point_a).
+    Parallel lines have no unique closest points: param_0 is set to 0 and param_1 to the matching parameter.
+    ARGS:
+        line_0, line_1 (tuple): two points (point_a, point_b) per line, each of shape (N, 3) and (M, 3) respectively
+        all_pairs (bool): compare every line of line_0 with every line of line_1 (default: False),
+            otherwise compare the lines pairwise, which requires N == M or one of them to be 1
+        return_points (bool): return the closest points (default: True); without them the all-pairs result
+            takes 3 instead of 9 values per pair, closest_approach_blocks bounds it entirely
+        tolerance (float): squared sine of the angle below which lines are treated as parallel (default: 1e-12)
+        chunk_size (int): number of line pairs processed at once if all_pairs is set, bounds temporary memory
+            (default: 4194304)
+    RETURNS:
+        dist (np.ndarray): minimum distances of shape (N,), or (N, M) for all pairs
+        param_0, param_1 (np.ndarray): line parameters of the closest points, same shape as dist
+        closest_0, closest_1 (np.ndarray): closest points on line_0 and line_1, shape of dist + (3,), or None
+    """
+    return _closest_approach(line_0, line_1, False, all_pairs, return_points, tolerance, chunk_size)
+
+def closest_approach_segments(seg_0: tuple, seg_1: tuple, all_pairs: bool = False, return_points: bool = True,
+                              tolerance: float = 1e-12, chunk_size: int = 4194304) -> tuple:
+    """Calculates the closest points between line segments, either for pairs of segments or for all combinations.
+    Points on the segments are seg_a + param * (seg_b - seg_a) with param between 0 and 1.
+    Parallel segments with overlapping projections have no unique closest points, one valid pair is returned.
+    ARGS:
+        seg_0, seg_1 (tuple): end points (seg_a, seg_b) per segment, each of shape (N, 3) and (M, 3) respectively
+        all_pairs (bool): compare every segment of seg_0 with every segment of seg_1 (default: False),
+            otherwise compare the segments pairwise, which requires N == M or one of them to be 1
+        return_points (bool): return the closest points (default: True); without them the all-pairs result
+            takes 3 instead of 9 values per pair, closest_approach_blocks bounds it entirely
+        tolerance (float): squared sine of the angle below which segments are treated as parallel (default: 1e-12)
+        chunk_size (int): number of segment pairs processed at once if all_pairs is set, bounds temporary memory
+            (default: 4194304)
+    RETURNS:
+        dist (np.ndarray): minimum distances of shape (N,), or (N, M) for all pairs
+        param_0, param_1 (np.ndarray): segment parameters of the closest points, same shape as dist
+        closest_0, closest_1 (np.ndarray): closest points on seg_0 and seg_1, shape of dist + (3,), or None
+    """
+    return _closest_approach(seg_0, seg_1, True, all_pairs, return_points, tolerance, chunk_size)
+
+def _dist_sq_blocks(p_0: np.ndarray, p_1: np.ndarray, chunk_size: int, upper: bool = False):
+    """Yields blocks of squared distances between row ranges of p_0 and p_1 via |x|^2 + |y|^2 - 2 x.y.
+    With upper set, every block starts at the column of its first row, covering the upper triangle."""
+    # centering both sets reduces cancellation in the dot product identity
+    n, m = len(p_0), len(p_1)
+    center = (p_0.sum(axis=0) + p_1.sum(axis=0)) / max(n + m, 1)
+    q_0, q_1 = p_0 - center, p_1 - center
+    sq_0, sq_1 = np.einsum('ij,ij->i', q_0, q_0), np.einsum('ij,ij->i', q_1, q_1)
+    rows = max(1, chunk_size // max(m, 1))
+    for start in range(0, n, rows):
+        stop = min(n, start + rows)
+        col = start if upper else 0
+        block = q_0[start:stop] @ q_1[col:].T
+        block *= -2.0
+        block += sq_0[start:stop, None]
+        block += sq_1[None, col:]
+        np.maximum(block, 0.0, out=block)
+        yield start, stop, col, block
+
+def pairwise_distances(points_0, points_1=None, dtype=np.float64, out: np.ndarray = None,
+                       chunk_size: int = 4194304) -> np.ndarray:
+    """Calculates the distances between all pairs of points of two collections, one block of rows at a time.
+    ARGS:
+        points_0: points of shape (N, 3) or list of Point objects
+        points_1: points of shape (M, 3) or list of Point objects (default: None, i.e. points_0 with itself)
+        dtype: data type of the result, e.g. np.float32 for half the memory (default: np.float64)
+        out (np.ndarray): array of shape (N, M) to write the result to, e.g. a np.memmap for results larger than
+            memory (default: None); dtype is ignored if given
+        chunk_size (int): number of pairs processed at once, bounds memory use (default: 4194304)
+    RETURNS:
+        dist (np.ndarray): distances of shape (N, M)
+    """
+    p_0 = utility.vec_array(points_0)
+    p_1 = p_0 if points_1 is None else utility.vec_array(points_1)
+    if out is None:
+        out = np.empty((len(p_0), len(p_1)), dtype=dtype)
+    elif out.shape != (len(p_0), len(p_1)):
+        raise ValueError(f"Expected output of shape {(len(p_0), len(p_1))}, got {out.shape}")
+    for start, stop, _, block in _dist_sq_blocks(p_0, p_1, chunk_size):
+        np.sqrt(block, out=block)
+        if points_1 is None:
+            block[np.arange(stop - start), np.arange(start, stop)] = 0.0
+        out[start:stop] = block
+    return out
+
+def pairs_within(points_0, points_1, cutoff: float, dtype=np.float64, chunk_size: int = 4194304) -> tuple:
+    """Finds all pairs of points of two collections closer than a cutoff distance, without storing the full
+    distance matrix. Candidates from the dot product identity are confirmed with exact distances.
+    ARGS:
+        points_0: points of shape (N, 3) or list of Point objects
+        points_1: points of shape (M, 3) or list of Point objects, None for pairs within points_0, in which case
+            every pair is reported once with i < j
+        cutoff (float): maximum distance, inclusive
+        dtype: data type of the returned distances (default: np.float64)
+        chunk_size (int): number of pairs processed at once, bounds memory use (default: 4194304)
+    RETURNS:
+        i, j (np.ndarray): indices into points_0 and points_1 of shape (K,), sorted by i, then j
+        dist (np.ndarray): distances of shape (K,)
+    """
+    utility.argcheck_scalar(cutoff)
+    p_0 = utility.vec_array(points_0)
+    p_1 = p_0 if points_1 is None else utility.vec_array(points_1)
+    # slack for the rounding error of the identity, which scales with the squared coordinates
+    both = np.concatenate((p_0, p_1))
+    extent = np.ptp(both, axis=0).max() if len(both) else 0.0
+    limit = cutoff * cutoff + 16 * np.finfo(float).eps * 3 * extent * extent
+    found_i, found_j = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    for start, _, col, block in _dist_sq_blocks(p_0, p_1, chunk_size, upper=points_1 is None):
+        i, j = np.nonzero(block <= limit)
+        i, j = i + start, j + col
+        if points_1 is None:
+            i, j = i[i < j], j[i < j]
+        found_i.append(i)
+        found_j.append(j)
+    i, j = np.concatenate(found_i), np.concatenate(found_j)
+    dist = np.linalg.norm(p_0[i] - p_1[j], axis=1)
+    within = dist <= cutoff
+    return i[within], j[within], dist[within].astype(dtype)
+
 def intersection_line_plane(line: Line, plane: Plane) -> np.ndarray:
     """Calculates the intersection point between a line and a plane in 3D space.
     ARGS:
@@ -91,6 +432,119 @@ def intersection_line_plane(line: Line, plane: Plane) -> np.ndarray:
     intersection = l_a + np.dot(num/den, l_vec)
     return intersection
 
+def intersection_segment_triangle(seg_a: np.ndarray, seg_b: np.ndarray, tri_a: np.ndarray, tri_b: np.ndarray,
+                                  tri_c: np.ndarray, tolerance: float = 1e-12) -> tuple:
+    """Calculates the intersection points between line segments and triangles in 3D space, batched.
+    Segments parallel to their triangle are not counted as intersecting.
+    ARGS:
+        seg_a, seg_b (np.ndarray): segment end points of shape (N, 3)
+        tri_a, tri_b, tri_c (np.ndarray): triangle vertices of shape (N, 3), or (3,) for a single triangle
+        tolerance (float): relative tolerance for the parallel check and the triangle bounds (default: 1e-12)
+    RETURNS:
+        hit (np.ndarray): True where segment and triangle intersect, shape (N,)
+        intersection (np.ndarray): intersection points of shape (N, 3), NaN where not hit
+    """
+    p0 = utility.vec_array(seg_a)
+    direction = utility.vec_array(seg_b) - p0
+    a = np.asarray(tri_a, dtype=float)
+    e1 = np.asarray(tri_b, dtype=float) - a
+    e2 = np.asarray(tri_c, dtype=float) - a
+    dot = lambda u, v: np.sum(u * v, axis=-1)
+    h = np.cross(direction, e2)
+    det = dot(e1, h)
+    scale = np.linalg.norm(direction, axis=-1) * np.linalg.norm(np.cross(e1, e2), axis=-1)
+    parallel = np.abs(det) <= tolerance * scale
+    inv_det = 1.0 / np.where(parallel, 1.0, det)
+    s = p0 - a
+    u = dot(s, h) * inv_det
+    q = np.cross(s, e1)
+    v = dot(direction, q) * inv_det
+    t = dot(e2, q) * inv_det
+    eps = np.sqrt(tolerance)
+    hit = ~parallel & (u >= -eps) & (v >= -eps) & (u + v <= 1.0 + eps) & (t >= -eps) & (t <= 1.0 + eps)
+    intersection = np.where(hit[:, None], p0 + t[:, None] * direction, np.nan)
+    return hit, intersection
+
+def intersection_triangle_triangle(tri_a: tuple, tri_b: tuple, tolerance: float = 1e-12) -> tuple:
+    """Checks pairs of triangles for intersection and calculates their intersection segments, batched.
+    Pairs with one triangle entirely on one side of the plane of the other are rejected first. For the remaining
+    non-coplanar pairs, the edges of each triangle are intersected with the other triangle; the intersection
+    segment spans the outermost of these points. Coplanar pairs are tested in 2D and get no segment.
+    ARGS:
+        tri_a (tuple): vertices (a0, a1, a2) of the first triangles, each of shape (N, 3)
+        tri_b (tuple): vertices (b0, b1, b2) of the second triangles, each of shape (N, 3)
+        tolerance (float): relative tolerance for the coplanarity and parallel checks (default: 1e-12)
+    RETURNS:
+        hit (np.ndarray): True where the triangles intersect or touch, shape (N,)
+        segments (np.ndarray): intersection segment end points of shape (N, 2, 3),
+            NaN where not hit and for coplanar pairs
+    """
+    a = [utility.vec_array(v) for v in tri_a]
+    b = [utility.vec_array(v) for v in tri_b]
+    n_pairs = max(len(v) for v in a + b)
+    a = [np.broadcast_to(v, (n_pairs, 3)) for v in a]
+    b = [np.broadcast_to(v, (n_pairs, 3)) for v in b]
+    hit = np.zeros(n_pairs, dtype=bool)
+    segments = np.full((n_pairs, 2, 3), np.nan)
+
+    normal_a = np.cross(a[1] - a[0], a[2] - a[0])
+    normal_b = np.cross(b[1] - b[0], b[2] - b[0])
+    scale = np.max([np.linalg.norm(v - w, axis=1) for v, w in zip(a + b, a[1:] + a[:1] + b[1:] + b[:1])], axis=0)
+    len_a = np.linalg.norm(normal_a, axis=1)
+    len_b = np.linalg.norm(normal_b, axis=1)
+    eps = np.sqrt(tolerance)
+    side_b = np.stack([np.einsum('ij,ij->i', normal_a, v - a[0]) for v in b]) / np.maximum(len_a * scale, 1e-300)
+    side_a = np.stack([np.einsum('ij,ij->i', normal_b, v - b[0]) for v in a]) / np.maximum(len_b * scale, 1e-300)
+    separated = np.all(side_b > eps, axis=0) | np.all(side_b < -eps, axis=0) | \
+        np.all(side_a > eps, axis=0) | np.all(side_a < -eps, axis=0)
+    coplanar = ~separated & np.all(np.abs(side_b) <= eps, axis=0)
+
+    # non-coplanar pairs: edges of each triangle against the other triangle
+    idx = np.nonzero(~separated & ~coplanar)[0]
+    if idx.size:
+        points, hits = [], []
+        for tri_0, tri_1 in ((a, b), (b, a)):
+            for i in range(3):
+                edge_hit, point = intersection_segment_triangle(tri_0[i][idx], tri_0[(i + 1) % 3][idx],
+                                                                *[v[idx] for v in tri_1], tolerance=tolerance)
+                hits.append(edge_hit)
+                points.append(point)
+        hits, points = np.stack(hits, axis=1), np.stack(points, axis=1)
+        hit[idx] = hits.any(axis=1)
+        direction = np.cross(normal_a[idx], normal_b[idx])
+        proj = np.einsum('ikj,ij->ik', np.nan_to_num(points), direction)
+        first = np.argmin(np.where(hits, proj, np.inf), axis=1)
+        last = np.argmax(np.where(hits, proj, -np.inf), axis=1)
+        rows = np.arange(len(idx))
+        segments[idx] = np.stack((points[rows, first], points[rows, last]), axis=1)
+
+    # coplanar pairs: 2D test in the plane spanned by the two largest components of the normal
+    idx = np.nonzero(coplanar)[0]
+    if idx.size:
+        drop = np.argmax(np.abs(normal_a[idx]), axis=1)
+        keep = np.stack(((drop + 1) % 3, (drop + 2) % 3), axis=1)
+        rows = np.arange(len(idx))[:, None]
+        a2 = [v[idx][rows, keep] for v in a]
+        b2 = [v[idx][rows, keep] for v in b]
+        orient = lambda p, q, r: (q[:, 0] - p[:, 0]) * (r[:, 1] - p[:, 1]) - (q[:, 1] - p[:, 1]) * (r[:, 0] - p[:, 0])
+        overlap = np.zeros(len(idx), dtype=bool)
+        for i in range(3):
+            p, q = a2[i], a2[(i + 1) % 3]
+            for j in range(3):
+                r, s = b2[j], b2[(j + 1) % 3]
+                o1, o2, o3, o4 = orient(p, q, r), orient(p, q, s), orient(r, s, p), orient(r, s, q)
+                crossing = (o1 * o2 <= 0) & (o3 * o4 <= 0)
+                # collinear segments additionally need overlapping extents
+                collinear = (o1 == 0) & (o2 == 0)
+                extent = np.all((np.minimum(p, q) <= np.maximum(r, s)) & (np.minimum(r, s) <= np.maximum(p, q)), axis=1)
+                overlap |= crossing & (~collinear | extent)
+        for t0, t1 in ((a2, b2), (b2, a2)):
+            # a vertex of one triangle inside the other
+            o = np.stack([orient(t1[i], t1[(i + 1) % 3], t0[0]) for i in range(3)])
+            overlap |= np.all(o >= 0, axis=0) | np.all(o <= 0, axis=0)
+        hit[idx] = overlap
+    return hit, segments
+
 def project_vector(vector_0: np.array, vector_1: np.array) -> np.array:
     """Projects vector_0 onto vector_1 and returns the resulting vector.
     ARGS:
@@ -103,6 +557,250 @@ def project_vector(vector_0: np.array, vector_1: np.array) -> np.array:
     projection = num / den * vector_1
     return projection
 
+def sample_segments(seg_a: np.ndarray, seg_b: np.ndarray, count: int) -> np.ndarray:
+    """Samples evenly spaced points along many line segments, including both end points.
+    ARGS:
+        seg_a, seg_b (np.ndarray): segment end points of shape (M, 3), or (3,) for a single segment
+        count (int): number of points per segment, at least 2
+    RETURNS:
+        samples (np.ndarray): points of shape (M, count, 3), or (count, 3) for a single segment
+    """
+    utility.argcheck_scalar(count, integral=True)
+    utility.argcheck_minmax(2, float('inf'), count)
+    count = int(count)
+    a = np.asarray(seg_a, dtype=float)
+    ab = np.asarray(seg_b, dtype=float) - a
+    t = np.linspace(0.0, 1.0, count)[:, None]
+    samples = a[..., None, :] + t * ab[..., None, :]
+    return samples
+
+def grid_plane(plane: Plane, u_values: np.ndarray, v_values: np.ndarray) -> np.ndarray:
+    """Samples a grid of points on a plane, spanned by its defining vectors u (point a to b) and v (point a to c).
+    ARGS:
+        plane (Plane): plane in 3D space
+        u_values, v_values (np.ndarray): 1D arrays of parameters along u and v
+    RETURNS:
+        samples (np.ndarray): points of shape (len(u_values), len(v_values), 3)
+    """
+    utility.argcheck_type([Plane], plane)
+    u = np.asarray(u_values, dtype=float).ravel()
+    v = np.asarray(v_values, dtype=float).ravel()
+    samples = plane.point(u[:, None], v[None, :])
+    return samples
+
+def barycentric_grid(subdivisions: int) -> np.ndarray:
+    """Calculates barycentric weights of a regular grid on a triangle, each edge split into equal parts.
+    ARGS:
+        subdivisions (int): number of parts each edge is split into, at least 1
+    RETURNS:
+        weights (np.ndarray): barycentric weights of shape ((S + 1) * (S + 2) / 2, 3), rows sum to 1
+    """
+    utility.argcheck_scalar(subdivisions, integral=True)
+    utility.argcheck_minmax(1, float('inf'), subdivisions)
+    subdivisions = int(subdivisions)
+    i, j = np.triu_indices(subdivisions + 1)
+    # i + (subdivisions - j) <= subdivisions enumerates every grid node exactly once
+    w_b = i / subdivisions
+    w_c = (subdivisions - j) / subdivisions
+    weights = np.column_stack((1.0 - w_b - w_c, w_b, w_c))
+    return weights
+
+def sample_triangles(tri_a: np.ndarray, tri_b: np.ndarray, tri_c: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Samples points on many triangles at the same barycentric weights, e.g. from barycentric_grid.
+    ARGS:
+        tri_a, tri_b, tri_c (np.ndarray): triangle vertices of shape (F, 3), or (3,) for a single triangle
+        weights (np.ndarray): barycentric weights of shape (S, 3)
+    RETURNS:
+        samples (np.ndarray): points of shape (F, S, 3), or (S, 3) for a single triangle
+    """
+    w = np.asarray(weights, dtype=float).reshape(-1, 3)
+    corners = [np.asarray(t, dtype=float)[..., None, :] for t in (tri_a, tri_b, tri_c)]
+    samples = w[:, 0:1] * corners[0] + w[:, 1:2] * corners[1] + w[:, 2:3] * corners[2]
+    return samples
+
+def sample_mesh(mesh, count: int, seed=None) -> tuple:
+    """Samples points uniformly distributed over the surface of a triangle mesh.
+    Faces are chosen in proportion to their area, points within a face are uniformly distributed.
+    ARGS:
+        mesh: IndexedMesh or list of Face objects
+        count (int): number of points
+        seed: seed or numpy Generator for reproducible results (default: None)
+    RETURNS:
+        samples (np.ndarray): points of shape (count, 3)
+        face_id (np.ndarray): index of the face each point lies on, shape (count,)
+    """
+    utility.argcheck_scalar(count, integral=True)
+    count = int(count)
+    mesh = as_indexed_mesh(mesh)
+    rng = np.random.default_rng(seed)
+    tri_a, tri_b, tri_c = mesh.corners
+    area = np.linalg.norm(np.cross(tri_b - tri_a, tri_c - tri_a), axis=1)
+    if not area.sum() > 0:
+        raise ValueError("Cannot sample a mesh without surface area.")
+    cumulative = np.cumsum(area)
+    face_id = np.minimum(np.searchsorted(cumulative, rng.random(count) * cumulative[-1], side='right'),
+                         len(area) - 1)
+    # reflecting points of the unit square beyond the diagonal keeps them uniform on the triangle
+    r = rng.random((count, 2))
+    outside = r.sum(axis=1) > 1.0
+    r[outside] = 1.0 - r[outside]
+    samples = tri_a[face_id] + r[:, 0:1] * (tri_b[face_id] - tri_a[face_id]) + \
+        r[:, 1:2] * (tri_c[face_id] - tri_a[face_id])
+    return samples, face_id
+
+def _cluster_moments(points: np.ndarray, labels: np.ndarray, n_clusters: int) -> tuple:
+    """Calculates counts, centroids and covariance matrices of labelled point clusters."""
+    counts = np.bincount(labels, minlength=n_clusters)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centroids = np.stack([np.bincount(labels, points[:, j], n_clusters) for j in range(3)], axis=1) / counts[:, None]
+        centered = points - centroids[labels]
+        cov = np.empty((n_clusters, 3, 3))
+        for i in range(3):
+            for j in range(i, 3):
+                cov[:, i, j] = cov[:, j, i] = np.bincount(labels, centered[:, i] * centered[:, j], n_clusters)
+    return counts, centroids, cov
+
+def fit_planes(points, labels: np.ndarray) -> tuple:
+    """Fits planes to many point clusters at once, minimizing the sum of squared orthogonal distances.
+    ARGS:
+        points: ndarray of shape (N, 3) or list of Point objects
+        labels (np.ndarray): non-negative cluster index per point, shape (N,)
+    RETURNS:
+        centroids (np.ndarray): point on each plane of shape (K, 3), K = labels.max() + 1
+        normals (np.ndarray): unit normal of each plane of shape (K, 3), NaN for clusters with less than 3 points
+    """
+    p = utility.vec_array(points)
+    labels = np.asarray(labels, dtype=np.int64)
+    n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    counts, centroids, cov = _cluster_moments(p, labels, n_clusters)
+    valid = counts >= 3
+    normals = np.full((n_clusters, 3), np.nan)
+    normals[valid] = np.linalg.eigh(cov[valid])[1][:, :, 0]
+    return centroids, normals
+
+def fit_lines(points, labels: np.ndarray) -> tuple:
+    """Fits lines to many point clusters at once, minimizing the sum of squared orthogonal distances.
+    ARGS:
+        points: ndarray of shape (N, 3) or list of Point objects
+        labels (np.ndarray): non-negative cluster index per point, shape (N,)
+    RETURNS:
+        centroids (np.ndarray): point on each line of shape (K, 3), K = labels.max() + 1
+        directions (np.ndarray): unit direction of each line of shape (K, 3), NaN for clusters with less than 2 points
+    """
+    p = utility.vec_array(points)
+    labels = np.asarray(labels, dtype=np.int64)
+    n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    counts, centroids, cov = _cluster_moments(p, labels, n_clusters)
+    valid = counts >= 2
+    directions = np.full((n_clusters, 3), np.nan)
+    directions[valid] = np.linalg.eigh(cov[valid])[1][:, :, 2]
+    return centroids, directions
+
+def _model_dist(points: np.ndarray, base: np.ndarray, axis: np.ndarray, model: str) -> np.ndarray:
+    """Distances of points (N, 3) to models given per point and hypothesis by base and axis arrays (N, B, 3).
+    Plane models use the unit normal as axis, line models the unit direction."""
+    # differences first: expanding |p - b|^2 cancels catastrophically for large (e.g. georeferenced) coordinates
+    diff = points[:, None] - base
+    proj = np.einsum('nbj,nbj->nb', diff, axis)
+    if model == 'plane':
+        return np.abs(proj)
+    offset_sq = np.einsum('nbj,nbj->nb', diff, diff)
+    return np.sqrt(np.maximum(offset_sq - proj * proj, 0.0))
+
+def _ransac(points, threshold: float, labels, iterations: int, batch_size: int, seed, chunk_size: int,
+            model: str) -> tuple:
+    """Batched RANSAC for planes and lines over labelled clusters, see ransac_planes and ransac_lines."""
+    p = utility.vec_array(points)
+    labels = np.zeros(len(p), dtype=np.int64) if labels is None else np.asarray(labels, dtype=np.int64)
+    n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    n_sample = 3 if model == 'plane' else 2
+    rng = np.random.default_rng(seed)
+
+    order = np.argsort(labels, kind='stable')
+    p_sorted, l_sorted = p[order], labels[order]
+    counts = np.bincount(labels, minlength=n_clusters)
+    starts = np.cumsum(counts) - counts
+    best_count = np.zeros(n_clusters, dtype=np.int64)
+    best_base = np.full((n_clusters, 3), np.nan)
+    best_axis = np.full((n_clusters, 3), np.nan)
+
+    for it0 in range(0, iterations, batch_size):
+        n_hyp = min(batch_size, iterations - it0)
+        # minimal samples for all clusters and hypotheses of this batch
+        pick = starts[:, None, None] + (rng.random((n_clusters, n_hyp, n_sample)) * counts[:, None, None]).astype(np.int64)
+        sample = p_sorted[np.minimum(pick, len(p) - 1)]
+        base = sample[:, :, 0]
+        if model == 'plane':
+            axis = np.cross(sample[:, :, 1] - base, sample[:, :, 2] - base)
+        else:
+            axis = sample[:, :, 1] - base
+        length = np.linalg.norm(axis, axis=2, keepdims=True)
+        # degenerated samples get NaN axes and thereby no inliers
+        axis = np.where(length > 0, axis / np.where(length > 0, length, 1.0), np.nan)
+
+        inlier_count = np.zeros((n_clusters, n_hyp), dtype=np.int64)
+        step = max(1, chunk_size // n_hyp)
+        for c0 in range(0, len(p), step):
+            lab = l_sorted[c0:c0 + step]
+            inl = _model_dist(p_sorted[c0:c0 + step], base[lab], axis[lab], model) <= threshold
+            clusters, first = np.unique(lab, return_index=True)
+            inlier_count[clusters] += np.add.reduceat(inl, first, axis=0)
+        best_hyp = np.argmax(inlier_count, axis=1)
+        rows = np.arange(n_clusters)
+        better = inlier_count[rows, best_hyp] > best_count
+        best_count[better] = inlier_count[rows, best_hyp][better]
+        best_base[better] = base[rows, best_hyp][better]
+        best_axis[better] = axis[rows, best_hyp][better]
+
+    # refit each cluster to the inliers of its best hypothesis
+    inliers = _model_dist(p, best_base[labels][:, None], best_axis[labels][:, None], model)[:, 0] <= threshold
+    fit = fit_planes if model == 'plane' else fit_lines
+    if inliers.any():
+        centroids, axes = fit(p[inliers], labels[inliers])
+        refit = np.zeros(n_clusters, dtype=bool)
+        refit[:len(centroids)] = np.all(np.isfinite(axes), axis=1)
+        best_base[refit], best_axis[refit] = centroids[refit[:len(centroids)]], axes[refit[:len(centroids)]]
+        inliers = _model_dist(p, best_base[labels][:, None], best_axis[labels][:, None], model)[:, 0] <= threshold
+    return best_base, best_axis, inliers
+
+def ransac_planes(points, threshold: float, labels: np.ndarray = None, iterations: int = 256, batch_size: int = 64,
+                  seed=None, chunk_size: int = 4194304) -> tuple:
+    """Fits planes robustly to point clusters with RANSAC, followed by a least squares refit to the inliers.
+    The hypotheses of a batch are evaluated for all clusters at once as array operations.
+    ARGS:
+        points: ndarray of shape (N, 3) or list of Point objects
+        threshold (float): maximum distance of inliers to the plane
+        labels (np.ndarray): non-negative cluster index per point, shape (N,) (default: None, single cluster)
+        iterations (int): number of hypotheses per cluster (default: 256)
+        batch_size (int): number of hypotheses evaluated at once (default: 64)
+        seed: seed for the random number generator (default: None)
+        chunk_size (int): number of point-hypothesis pairs evaluated at once, bounds memory use (default: 4194304)
+    RETURNS:
+        centroids (np.ndarray): point on each plane of shape (K, 3)
+        normals (np.ndarray): unit normal of each plane of shape (K, 3), NaN if no valid plane was found
+        inliers (np.ndarray): True for points within threshold of the plane of their cluster, shape (N,)
+    """
+    return _ransac(points, threshold, labels, iterations, batch_size, seed, chunk_size, 'plane')
+
+def ransac_lines(points, threshold: float, labels: np.ndarray = None, iterations: int = 256, batch_size: int = 64,
+                 seed=None, chunk_size: int = 4194304) -> tuple:
+    """Fits lines robustly to point clusters with RANSAC, followed by a least squares refit to the inliers.
+    The hypotheses of a batch are evaluated for all clusters at once as array operations.
+    ARGS:
+        points: ndarray of shape (N, 3) or list of Point objects
+        threshold (float): maximum distance of inliers to the line
+        labels (np.ndarray): non-negative cluster index per point, shape (N,) (default: None, single cluster)
+        iterations (int): number of hypotheses per cluster (default: 256)
+        batch_size (int): number of hypotheses evaluated at once (default: 64)
+        seed: seed for the random number generator (default: None)
+        chunk_size (int): number of point-hypothesis pairs evaluated at once, bounds memory use (default: 4194304)
+    RETURNS:
+        centroids (np.ndarray): point on each line of shape (K, 3)
+        directions (np.ndarray): unit direction of each line of shape (K, 3), NaN if no valid line was found
+        inliers (np.ndarray): True for points within threshold of the line of their cluster, shape (N,)
+    """
+    return _ransac(points, threshold, labels, iterations, batch_size, seed, chunk_size, 'line')
+
 def map_xyz_to_uv(origin, u_axis: np.ndarray, normal: np.ndarray, point, norm: bool = True) -> np.ndarray:
     """Map coordinates of a point in 3D space to local UV coordinates.
     ARGS:
@@ -110,14 +808,18 @@ def map_xyz_to_uv(origin, u_axis: np.ndarray, normal: np.ndarray, point, norm: b
         u_axis (np.ndarray): vector defining local U axis
         normal (np.ndarray): normal pointing out of UV plane
             i.e. the plane in 3D space on which the UV coordinate system resides
-        point: Point to be translated to UV projection. Either Point object or vector.
+        point: Point to be translated to UV projection. Either Point object or vector,
+            or ndarray of shape (N, 3) for a batch of points.
         norm (bool): normalize UV coordinate system (default: True) or use U vector to scale UV system.
     RETURNS:
-        uv_coords (UVPoint): UVPoint object on UV plane.
+        uv_coords (UVPoint): UVPoint object on UV plane, or ndarray of shape (N, 2) for a batch of points.
     """
     origin = utility.vec(origin)
     point = utility.vec(point)
-    utility.argcheck_dim(3, origin, u_axis, normal, point)
+    if point.ndim == 2:
+        utility.argcheck_dim(3, origin, u_axis, normal, point[0] if len(point) else origin)
+    else:
+        utility.argcheck_dim(3, origin, u_axis, normal, point)
 
     point = point - origin
     v_axis = np.cross(u_axis, -normal)
@@ -126,7 +828,7 @@ def map_xyz_to_uv(origin, u_axis: np.ndarray, normal: np.ndarray, point, norm: b
         u_axis = u_axis / np.linalg.norm(u_axis)
         v_axis = v_axis / np.linalg.norm(v_axis)
     uv_system = np.stack((u_axis, v_axis))
-    uv_coords = np.dot(uv_system, point)
+    uv_coords = np.dot(point, uv_system.T)
     return uv_coords
 
 def left_of(uv_vector_0: np.ndarray, uv_vector_1: np.ndarray) -> bool:
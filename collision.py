@@ -0,0 +1,93 @@
+"""Collision detection between triangle meshes.
+
+Copyright (c) 2020 N.Wichmann
+
+Licensed under the Mozilla Public License 2.0
+(see attached License.txt or https://www.mozilla.org/en-US/MPL/2.0/)
+"""
+
+import numpy as np
+import calc
+
+from meshtypes import as_indexed_mesh
+
+
+def _contact_margin(mesh_a, mesh_b, tolerance: float) -> float:
+    """Largest gap between two faces accepted as contact by calc.intersection_triangle_triangle.
+    Its barycentric and segment parameter bounds are relaxed by sqrt(tolerance), which allows points up to about
+    three times sqrt(tolerance) times the longest edge outside a face; the margin doubles that bound."""
+    longest = max(max(np.linalg.norm(v - w, axis=1).max(initial=0.0) for v, w in zip(c, c[1:] + c[:1]))
+                  for c in (mesh_a.corners, mesh_b.corners))
+    return 6.0 * np.sqrt(tolerance) * longest
+
+def candidate_pairs(mesh_a, mesh_b, tolerance: float = 1e-12, chunk_size: int = 65536):
+    """Broad phase: finds pairs of faces with overlapping bounding boxes.
+    Traverses the bounding volume hierarchies of both meshes simultaneously. Boxes are grown by the contact
+    tolerance of the narrow phase, so that touching faces are not missed.
+    ARGS:
+        mesh_a, mesh_b: IndexedMesh or list of Face objects
+        tolerance (float): relative tolerance of the triangle-triangle test (default: 1e-12)
+        chunk_size (int): number of node pairs processed at once, bounds memory use (default: 65536)
+    YIELDS:
+        face_a, face_b (np.ndarray): face indices of both meshes with overlapping bounding boxes
+    """
+    mesh_a, mesh_b = as_indexed_mesh(mesh_a), as_indexed_mesh(mesh_b)
+    min_a, max_a = mesh_a.bounds
+    min_b, max_b = mesh_b.bounds
+    margin = _contact_margin(mesh_a, mesh_b, tolerance)
+    for face_a, face_b in mesh_a.tree.overlap_pairs(mesh_b.tree, chunk_size, margin):
+        overlap = np.all((min_a[face_a] <= max_b[face_b] + margin) & (min_b[face_b] <= max_a[face_a] + margin),
+                         axis=1)
+        yield face_a[overlap], face_b[overlap]
+
+def collide_meshes(mesh_a, mesh_b, tolerance: float = 1e-12, chunk_size: int = 65536) -> np.ndarray:
+    """Finds all pairs of intersecting or touching faces of two meshes.
+    ARGS:
+        mesh_a, mesh_b: IndexedMesh or list of Face objects
+        tolerance (float): relative tolerance of the triangle-triangle test (default: 1e-12)
+        chunk_size (int): number of node pairs processed at once, bounds memory use (default: 65536)
+    RETURNS:
+        pairs (np.ndarray): face indices of shape (K, 2), first column in mesh_a, second column in mesh_b
+    """
+    mesh_a, mesh_b = as_indexed_mesh(mesh_a), as_indexed_mesh(mesh_b)
+    corners_a, corners_b = mesh_a.corners, mesh_b.corners
+    pairs = [np.empty((0, 2), dtype=np.int64)]
+    for face_a, face_b in candidate_pairs(mesh_a, mesh_b, tolerance, chunk_size):
+        hit, _ = calc.intersection_triangle_triangle([v[face_a] for v in corners_a], [v[face_b] for v in corners_b],
+                                                     tolerance)
+        pairs.append(np.column_stack((face_a[hit], face_b[hit])))
+    pairs = np.concatenate(pairs)
+    return pairs
+
+def meshes_intersect(mesh_a, mesh_b, tolerance: float = 1e-12, chunk_size: int = 65536) -> bool:
+    """Checks whether two meshes intersect or touch. Stops at the first chunk containing an intersection.
+    ARGS:
+        mesh_a, mesh_b: IndexedMesh or list of Face objects
+        tolerance (float): relative tolerance of the triangle-triangle test (default: 1e-12)
+        chunk_size (int): number of node pairs processed at once, bounds memory use (default: 65536)
+    RETURNS:
+        intersecting (bool): True if at least one pair of faces intersects
+    """
+    mesh_a, mesh_b = as_indexed_mesh(mesh_a), as_indexed_mesh(mesh_b)
+    corners_a, corners_b = mesh_a.corners, mesh_b.corners
+    for face_a, face_b in candidate_pairs(mesh_a, mesh_b, tolerance, chunk_size):
+        hit, _ = calc.intersection_triangle_triangle([v[face_a] for v in corners_a], [v[face_b] for v in corners_b],
+                                                     tolerance)
+        if hit.any():
+            return True
+    return False
+
+def intersection_segments(mesh_a, mesh_b, pairs: np.ndarray, tolerance: float = 1e-12) -> np.ndarray:
+    """Calculates the intersection segments of colliding face pairs, e.g. as found by collide_meshes.
+    ARGS:
+        mesh_a, mesh_b: IndexedMesh or list of Face objects
+        pairs (np.ndarray): face indices of shape (K, 2), first column in mesh_a, second column in mesh_b
+        tolerance (float): relative tolerance of the triangle-triangle test (default: 1e-12)
+    RETURNS:
+        segments (np.ndarray): segment end points of shape (K, 2, 3), NaN for coplanar pairs
+    """
+    mesh_a, mesh_b = as_indexed_mesh(mesh_a), as_indexed_mesh(mesh_b)
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    _, segments = calc.intersection_triangle_triangle([v[pairs[:, 0]] for v in mesh_a.corners],
+                                                      [v[pairs[:, 1]] for v in mesh_b.corners], tolerance)
+    return segments
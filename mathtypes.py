@@ -9,6 +9,8 @@ Licensed under the Mozilla Public License 2.0
 from numpy import array
 from numpy import ndarray
 from numpy import cross
+from numpy import linalg
+from numpy import asarray
 import utility
 
 class Point:
@@ -146,15 +148,33 @@ class Line:
         self.__vector = new_vector
         self.__point_b = self.__point_a + self.__vector
 
-    def point(self, scale: float) -> ndarray:
-        """Returns a point on the line.
+    @classmethod
+    def fit(cls, points):
+        """Fits a line to points, minimizing the sum of squared orthogonal distances.
         ARGS:
-            scale (float): scales the direction vector of the line extending from base point
+            points: ndarray of shape (N, 3) or list of Point objects, at least 2 distinct points
         RETURNS:
-            point_on_line (ndarray): Point on line, determined by scaling line direction vector
+            line (Line): line through the centroid of the points along their principal direction
         """
-        utility.argcheck_type([int, float], scale)
-        point_on_line = self.point_a + scale * self.vector
+        coords = utility.vec_array(points, cls._dimension)
+        if len(coords) < 2:
+            raise ValueError("Fitting a line takes at least 2 points.")
+        centroid = coords.mean(axis=0)
+        _, _, axes = linalg.svd(coords - centroid, full_matrices=False)
+        line = cls(centroid, axes[0], 'vector')
+        return line
+
+    def point(self, scale) -> ndarray:
+        """Returns a point on the line, or a batch of points for an array of parameters.
+        ARGS:
+            scale (float or ndarray): scales the direction vector of the line extending from base point
+        RETURNS:
+            point_on_line (ndarray): Point on line, determined by scaling line direction vector,
+                of shape scale.shape + (3,) for an array of parameters
+        """
+        utility.argcheck_param(scale)
+        scale = asarray(scale, dtype=float)
+        point_on_line = self.point_a + scale[..., None] * self.vector
         return point_on_line
 
 
@@ -214,6 +234,22 @@ class Plane:
             self.__point_c = self.__point_a + self.__vector_v
         self.__normal = cross(self.__vector_u, self.__vector_v)
 
+    @classmethod
+    def fit(cls, points):
+        """Fits a plane to points, minimizing the sum of squared orthogonal distances.
+        ARGS:
+            points: ndarray of shape (N, 3) or list of Point objects, at least 3 non-collinear points
+        RETURNS:
+            plane (Plane): plane through the centroid of the points, spanned by their two principal directions
+        """
+        coords = utility.vec_array(points, cls._dimension)
+        if len(coords) < 3:
+            raise ValueError("Fitting a plane takes at least 3 points.")
+        centroid = coords.mean(axis=0)
+        _, _, axes = linalg.svd(coords - centroid, full_matrices=False)
+        plane = cls(centroid, axes[0], axes[1], 'vector')
+        return plane
+
     def __recalc_normal(self):
         """Recalculates the normal after point update."""
         self.__vector_u = self.__point_b - self.__point_a
@@ -257,15 +293,18 @@ class Plane:
     def normal(self) -> ndarray:
         return self.__normal
 
-    def point(self, scale_a: float, scale_b: float) -> ndarray:
-        """Calculates a point on the plane
+    def point(self, scale_a, scale_b) -> ndarray:
+        """Calculates a point on the plane, or a batch of points for arrays of parameters
         ARGS:
-           scale_a (float): scales vector a
-           scale_b (float): scales vector b
+           scale_a (float or ndarray): scales vector u (from point a to point b)
+           scale_b (float or ndarray): scales vector v (from point a to point c)
         RETURNS:
-            point_on_plane (ndarray): Point on plane, determined by scaling defining vectors
+            point_on_plane (ndarray): Point on plane, determined by scaling defining vectors,
+                of the broadcast shape of the parameters + (3,) for arrays of parameters
         """
-        utility.argcheck_type([int, float], scale_a)
-        utility.argcheck_type([int, float], scale_b)
-        point_on_plane = self.point_a + scale_a * self.__vector_v + scale_b * self.__vector_v
+        utility.argcheck_param(scale_a)
+        utility.argcheck_param(scale_b)
+        scale_a = asarray(scale_a, dtype=float)
+        scale_b = asarray(scale_b, dtype=float)
+        point_on_plane = self.point_a + scale_a[..., None] * self.__vector_u + scale_b[..., None] * self.__vector_v
         return point_on_plane
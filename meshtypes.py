@@ -9,10 +9,22 @@ Licensed under the Mozilla Public License 2.0
 from numpy import array
 from numpy import ndarray
 from numpy import cross
+from numpy import asarray
+from numpy import unique
+from numpy import int64
+from numpy import linspace
+from numpy import argsort
+from numpy import bincount
+from numpy import concatenate
+from numpy import cumsum
+from numpy import repeat
+from numpy import arange
+from numpy.linalg import norm
 from functools import reduce
 
 import utility
 import mathtypes
+import spatial
 
 
 class Vertex(mathtypes.Point):
@@ -64,19 +76,32 @@ class Edge:
     def vector(self):
         return self.__vector
 
-    def point(self, proportion: float):
-        """Calculates a point on the edge.
+    def point(self, proportion):
+        """Calculates a point on the edge, or a batch of points for an array of proportions.
         ARGS:
-            proportion (float): Scalar between 0 and 1, representing the proportion of segment between first Vertex and
-            point to total Edge length.
+            proportion (float or ndarray): Scalar between 0 and 1, representing the proportion of segment between
+            first Vertex and point to total Edge length.
         RETURNS:
-            point_on_edge (ndarray): Point on edge
+            point_on_edge (ndarray): Point on edge, of shape proportion.shape + (3,) for an array of proportions
         """
-        utility.argcheck_type([int, float], proportion)
+        utility.argcheck_param(proportion)
         utility.argcheck_minmax(0, 1, proportion)
-        point_on_edge = self.__vertex_a + self.vector * proportion
+        proportion = asarray(proportion, dtype=float)
+        point_on_edge = self.__vertex_a + self.vector * proportion[..., None]
         return point_on_edge
 
+    def sample(self, count: int) -> ndarray:
+        """Calculates points evenly spaced along the edge, including both vertices.
+        ARGS:
+            count (int): number of points, at least 2
+        RETURNS:
+            points (ndarray): points of shape (count, 3)
+        """
+        utility.argcheck_scalar(count, integral=True)
+        utility.argcheck_minmax(2, float('inf'), count)
+        points = self.point(linspace(0.0, 1.0, int(count)))
+        return points
+
 
 class Face:
     """Face primitive in 3D space"""
@@ -248,4 +273,177 @@ class Face:
 
     @property
     def centerpoint(self):
-        pass
\ No newline at end of file
+        pass
+
+
+class IndexedMesh:
+    """Triangle mesh in 3D space, stored as shared vertex coordinates and per-face vertex indices"""
+    _dimension = 3
+
+    def __init__(self, vertices: ndarray, triangles: ndarray, check: bool = True):
+        """Creates indexed mesh
+        ARGS:
+            vertices (ndarray): vertex coordinates of shape (V, 3)
+            triangles (ndarray): vertex indices of shape (F, 3), counter-clockwise per face
+            check (bool): check the vertex indices (default: True), skipping avoids reading memory-mapped data
+        """
+        utility.argcheck_type([ndarray], vertices)
+        utility.argcheck_type([ndarray], triangles)
+        vertices = utility.vec_array(vertices, self._dimension)
+        triangles = asarray(triangles, dtype=int64).reshape(-1, 3)
+        if check and triangles.size and (triangles.min() < 0 or triangles.max() >= len(vertices)):
+            raise ValueError("Triangle vertex index out of bounds.")
+        self.__vertices = vertices
+        self.__triangles = triangles
+        self.__tree = None
+        # per-face data and the vertex-to-face incidence index are computed on first access
+        self.__normals = None
+        self.__box_min = None
+        self.__box_max = None
+        self.__incidence = None
+        # the vertex array may be shared with the caller or other meshes until the first edit
+        self.__owns_vertices = False
+
+    @classmethod
+    def from_faces(cls, faces: list):
+        """Creates indexed mesh from Face objects. Vertices with identical coordinates are merged.
+        ARGS:
+            faces (list): Face objects
+        RETURNS:
+            mesh (IndexedMesh): indexed mesh
+        """
+        for face in faces:
+            utility.argcheck_type([Face], face)
+        corners = array([[face.vertex_a.coords, face.vertex_b.coords, face.vertex_c.coords] for face in faces],
+                        dtype=float).reshape(-1, 3)
+        vertices, inverse = unique(corners, axis=0, return_inverse=True)
+        mesh = cls(vertices, inverse.reshape(-1, 3))
+        return mesh
+
+    def to_faces(self) -> list:
+        """Creates Face objects for all faces of the mesh.
+        RETURNS:
+            faces (list): Face objects
+        """
+        faces = [Face(*self.__vertices[tri].copy()) for tri in self.__triangles]
+        return faces
+
+    @property
+    def vertices(self) -> ndarray:
+        return self.__vertices
+
+    @property
+    def triangles(self) -> ndarray:
+        return self.__triangles
+
+    @property
+    def corners(self) -> tuple:
+        """Vertex coordinates of all faces as three arrays of shape (F, 3)"""
+        tri = self.__vertices[self.__triangles]
+        return tri[:, 0], tri[:, 1], tri[:, 2]
+
+    @property
+    def normals(self) -> ndarray:
+        """Non-normalized face normals of shape (F, 3), length equals twice the face area"""
+        if self.__normals is None:
+            self.__normals = self.__face_normals(self.__triangles)
+        return self.__normals
+
+    @property
+    def areas(self) -> ndarray:
+        """Face areas of shape (F,)"""
+        return 0.5 * norm(self.normals, axis=1)
+
+    @property
+    def bounds(self) -> tuple:
+        """Per-face bounding boxes as two arrays of shape (F, 3)"""
+        if self.__box_min is None:
+            self.__box_min, self.__box_max = self.__face_bounds(self.__triangles)
+        return self.__box_min, self.__box_max
+
+    def __face_normals(self, triangles: ndarray) -> ndarray:
+        tri = self.__vertices[triangles]
+        return cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+
+    def __face_bounds(self, triangles: ndarray) -> tuple:
+        tri = self.__vertices[triangles]
+        return tri.min(axis=1), tri.max(axis=1)
+
+    def vertex_faces(self, vertex_ids) -> ndarray:
+        """Looks up the faces using any of the given vertices in the vertex-to-face incidence index.
+        ARGS:
+            vertex_ids: vertex index or array of vertex indices
+        RETURNS:
+            face_ids (ndarray): sorted indices of the incident faces
+        """
+        if self.__incidence is None:
+            # compressed rows: faces of vertex v are face_ids[offsets[v]:offsets[v + 1]]
+            corner_faces = argsort(self.__triangles.ravel(), kind='stable') // 3
+            counts = bincount(self.__triangles.ravel(), minlength=len(self.__vertices))
+            offsets = concatenate(([0], cumsum(counts)))
+            self.__incidence = offsets, corner_faces
+        offsets, corner_faces = self.__incidence
+        vertex_ids = asarray(vertex_ids, dtype=int64).ravel()
+        start, count = offsets[vertex_ids], offsets[vertex_ids + 1] - offsets[vertex_ids]
+        seg_offset = cumsum(count) - count
+        slots = repeat(start - seg_offset, count) + arange(count.sum())
+        face_ids = unique(corner_faces[slots])
+        return face_ids
+
+    def move_vertices(self, vertex_ids, positions: ndarray) -> ndarray:
+        """Moves vertices to new positions. Normals, areas and bounds are only recalculated for the faces using
+        the moved vertices, and the bounding volume hierarchy is refitted instead of rebuilt.
+        The vertex array passed on creation is copied on the first edit and never modified.
+        ARGS:
+            vertex_ids: vertex index or array of vertex indices of shape (K,)
+            positions (ndarray): new coordinates of shape (K, 3), or (3,) for the same position for all
+        RETURNS:
+            face_ids (ndarray): indices of the updated faces
+        """
+        vertex_ids = asarray(vertex_ids, dtype=int64).ravel()
+        if vertex_ids.size and (vertex_ids.min() < 0 or vertex_ids.max() >= len(self.__vertices)):
+            raise ValueError("Vertex index out of bounds.")
+        positions = asarray(positions, dtype=float)
+        if positions.shape[-1:] != (self._dimension,):
+            raise ValueError(f"Expected positions of shape (K, {self._dimension})")
+        if not self.__owns_vertices:
+            # copy on the first edit, leaving the caller's (possibly read-only or memory-mapped) array untouched
+            self.__vertices = self.__vertices.copy()
+            self.__owns_vertices = True
+        self.__vertices[vertex_ids] = positions
+
+        face_ids = self.vertex_faces(vertex_ids)
+        triangles = self.__triangles[face_ids]
+        if self.__normals is not None:
+            self.__normals[face_ids] = self.__face_normals(triangles)
+        if self.__box_min is not None:
+            self.__box_min[face_ids], self.__box_max[face_ids] = self.__face_bounds(triangles)
+        if self.__tree is not None:
+            self.__tree.refit(*self.bounds, prim_ids=face_ids)
+        return face_ids
+
+    @property
+    def tree(self) -> spatial.AABBTree:
+        """Bounding volume hierarchy over the faces, built on first access"""
+        if self.__tree is None:
+            self.__tree = spatial.AABBTree(*self.bounds)
+        return self.__tree
+
+    @tree.setter
+    def tree(self, new_tree: spatial.AABBTree):
+        utility.argcheck_type([spatial.AABBTree], new_tree)
+        if len(new_tree.order) != len(self.__triangles):
+            raise ValueError(f"Tree over {len(new_tree.order)} primitives does not match {len(self.__triangles)} faces.")
+        self.__tree = new_tree
+
+
+def as_indexed_mesh(mesh) -> IndexedMesh:
+    """Converts a list of Face objects to an IndexedMesh, passes IndexedMesh objects through.
+    ARGS:
+        mesh: IndexedMesh or list of Face objects
+    RETURNS:
+        mesh (IndexedMesh): indexed mesh
+    """
+    if type(mesh) != IndexedMesh:
+        mesh = IndexedMesh.from_faces(mesh)
+    return mesh
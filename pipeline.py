@@ -0,0 +1,432 @@
+"""Streaming, chunked processing of point clouds larger than memory.
+
+Copyright (c) 2020 N.Wichmann
+
+Licensed under the Mozilla Public License 2.0
+(see attached License.txt or https://www.mozilla.org/en-US/MPL/2.0/)
+"""
+
+import time
+import tracemalloc
+from itertools import islice
+
+import numpy as np
+import utility
+import calc
+
+from mathtypes import Plane
+
+
+_ply_types = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1', 'short': 'i2', 'int16': 'i2',
+              'ushort': 'u2', 'uint16': 'u2', 'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+              'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+
+def _traced_call(function, *args) -> tuple:
+    """Calls function and measures the peak of the memory allocated during the call in MB.
+    The peak is None if tracemalloc is not tracing or cannot reset its peak (Python < 3.9)."""
+    measure = tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak')
+    if measure:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    peak = (tracemalloc.get_traced_memory()[1] - base) / 2 ** 20 if measure else None
+    return result, seconds, peak
+
+def _read_text_lines(lines, chunk_size: int, delimiter: str, columns: tuple, max_rows: int = None):
+    """Parses chunks of text lines to (K, 3) arrays."""
+    rows = 0
+    while max_rows is None or rows < max_rows:
+        n = chunk_size if max_rows is None else min(chunk_size, max_rows - rows)
+        chunk = list(islice(lines, n))
+        if not chunk:
+            break
+        points = np.loadtxt(chunk, delimiter=delimiter, usecols=columns, ndmin=2, comments='#')
+        rows += len(chunk)
+        if len(points):
+            yield points
+
+def read_xyz(path: str, chunk_size: int = 1048576, delimiter: str = None, skip_header: int = 0,
+             columns: tuple = (0, 1, 2)):
+    """Reads points from a text file (XYZ, CSV) in chunks.
+    ARGS:
+        path (str): path to the file
+        chunk_size (int): number of lines per chunk (default: 1048576)
+        delimiter (str): column delimiter, None for whitespace (default: None)
+        skip_header (int): number of lines to skip at the beginning of the file (default: 0)
+        columns (tuple): indices of the X, Y and Z columns (default: (0, 1, 2))
+    YIELDS:
+        points (np.ndarray): point coordinates of shape (K, 3)
+    """
+    with open(path, 'r') as file:
+        for _ in range(skip_header):
+            file.readline()
+        yield from _read_text_lines(file, chunk_size, delimiter, columns)
+
+def read_binary(path: str, chunk_size: int = 1048576, dtype: str = '<f4', offset: int = 0):
+    """Reads points from a raw binary file of consecutive XYZ triplets in chunks. The file is memory-mapped,
+    chunks are views into the file.
+    ARGS:
+        path (str): path to the file
+        chunk_size (int): number of points per chunk (default: 1048576)
+        dtype (str): numpy data type of the coordinates (default: '<f4', little endian float32)
+        offset (int): number of bytes to skip at the beginning of the file (default: 0)
+    YIELDS:
+        points (np.ndarray): point coordinates of shape (K, 3)
+    """
+    data = np.memmap(path, dtype=dtype, mode='r', offset=offset)
+    data = data[:len(data) - len(data) % 3].reshape(-1, 3)
+    for c0 in range(0, len(data), chunk_size):
+        # plain ndarray views, np.memmap chunks fail the exact type checks of the primitive types
+        yield np.asarray(data[c0:c0 + chunk_size])
+
+def read_ply(path: str, chunk_size: int = 1048576):
+    """Reads the vertex coordinates of a PLY file (ASCII or binary) in chunks. Binary files are memory-mapped.
+    The vertex element has to be the first element of the file.
+    ARGS:
+        path (str): path to the file
+        chunk_size (int): number of points per chunk (default: 1048576)
+    YIELDS:
+        points (np.ndarray): point coordinates of shape (K, 3)
+    """
+    with open(path, 'rb') as file:
+        if file.readline().strip() != b'ply':
+            raise ValueError(f"{path} is not a PLY file.")
+        fmt, elements = None, []
+        for line in file:
+            words = line.decode('ascii').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'end_header':
+                break
+            if words[0] == 'format':
+                fmt = words[1]
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property':
+                if words[1] == 'list':
+                    elements[-1][2].append((words[-1], None))
+                else:
+                    elements[-1][2].append((words[-1], _ply_types[words[1]]))
+        header_size = file.tell()
+
+        if not elements or elements[0][0] != 'vertex':
+            raise ValueError("PLY reader expects the vertex element as first element.")
+        _, n_vertices, properties = elements[0]
+        names = [name for name, _ in properties]
+        if any(ptype is None for _, ptype in properties) or not {'x', 'y', 'z'} <= set(names):
+            raise ValueError("PLY vertex element needs scalar properties x, y and z.")
+
+        if fmt == 'ascii':
+            columns = tuple(names.index(c) for c in 'xyz')
+            lines = (line.decode('ascii') for line in file)
+            yield from _read_text_lines(lines, chunk_size, None, columns, n_vertices)
+            return
+    if fmt not in ('binary_little_endian', 'binary_big_endian'):
+        raise ValueError(f"Unknown PLY format {fmt}")
+    order = '<' if fmt == 'binary_little_endian' else '>'
+    vertex_type = np.dtype([(name, order + ptype) for name, ptype in properties])
+    data = np.memmap(path, dtype=vertex_type, mode='r', offset=header_size, shape=(n_vertices,))
+    for c0 in range(0, n_vertices, chunk_size):
+        chunk = data[c0:c0 + chunk_size]
+        yield np.column_stack((chunk['x'], chunk['y'], chunk['z'])).astype(float)
+
+def read_points(path: str, chunk_size: int = 1048576, **kwargs):
+    """Reads points in chunks, selecting the reader by file extension:
+    .xyz, .txt (whitespace separated), .csv (comma separated), .ply, .bin, .raw (binary XYZ triplets).
+    ARGS:
+        path (str): path to the file
+        chunk_size (int): number of points per chunk (default: 1048576)
+        **kwargs: passed on to the reader
+    YIELDS:
+        points (np.ndarray): point coordinates of shape (K, 3)
+    """
+    suffix = str(path).lower().rsplit('.', 1)[-1]
+    if suffix in ('xyz', 'txt'):
+        yield from read_xyz(path, chunk_size, **kwargs)
+    elif suffix == 'csv':
+        kwargs.setdefault('delimiter', ',')
+        yield from read_xyz(path, chunk_size, **kwargs)
+    elif suffix == 'ply':
+        yield from read_ply(path, chunk_size)
+    elif suffix in ('bin', 'raw'):
+        yield from read_binary(path, chunk_size, **kwargs)
+    else:
+        raise ValueError(f"Unknown point cloud file extension: .{suffix}")
+
+
+def transform(matrix: np.ndarray, translation: np.ndarray = None):
+    """Creates a stage applying an affine transformation to point chunks.
+    ARGS:
+        matrix (np.ndarray): 4x4 homogeneous transformation matrix or 3x3 linear transformation matrix
+        translation (np.ndarray): translation vector, only used with 3x3 matrix (default: None)
+    RETURNS:
+        stage (callable): maps (K, 3) arrays to transformed (K, 3) arrays
+    """
+    utility.argcheck_type([np.ndarray], matrix)
+    if matrix.shape == (4, 4):
+        linear, offset = matrix[:3, :3], matrix[:3, 3]
+    elif matrix.shape == (3, 3):
+        linear = matrix
+        offset = np.zeros(3) if translation is None else np.asarray(translation, dtype=float)
+    else:
+        raise ValueError(f"Expected transformation matrix of shape (4, 4) or (3, 3), got {matrix.shape}")
+
+    def stage(points: np.ndarray) -> np.ndarray:
+        return np.dot(points, linear.T) + offset
+    stage.__name__ = 'transform'
+    return stage
+
+def to_uv(origin, u_axis: np.ndarray, normal: np.ndarray, norm: bool = True):
+    """Creates a stage mapping point chunks to local UV coordinates, see calc.map_xyz_to_uv.
+    RETURNS:
+        stage (callable): maps (K, 3) arrays to (K, 2) arrays
+    """
+    def stage(points: np.ndarray) -> np.ndarray:
+        return calc.map_xyz_to_uv(origin, u_axis, normal, points, norm)
+    stage.__name__ = 'to_uv'
+    return stage
+
+def distance_to_plane(plane: Plane, signed: bool = False):
+    """Creates a stage calculating the distance of point chunks to a plane.
+    ARGS:
+        plane (Plane): Plane in 3D space
+        signed (bool): keep the sign, positive on the side the plane normal points to (default: False)
+    RETURNS:
+        stage (callable): maps (K, 3) arrays to (K,) arrays of distances
+    """
+    utility.argcheck_type([Plane], plane)
+    unit_normal = plane.normal / np.linalg.norm(plane.normal)
+    base = plane.point_a
+
+    def stage(points: np.ndarray) -> np.ndarray:
+        dist = np.dot(points - base, unit_normal)
+        return dist if signed else np.abs(dist)
+    stage.__name__ = 'distance_to_plane'
+    return stage
+
+def within_box(box_min: np.ndarray, box_max: np.ndarray):
+    """Creates a stage keeping only the points of a chunk inside an axis aligned box.
+    ARGS:
+        box_min, box_max (np.ndarray): box corners
+    RETURNS:
+        stage (callable): maps (K, 3) arrays to filtered (L, 3) arrays
+    """
+    box_min, box_max = utility.vec(box_min), utility.vec(box_max)
+
+    def stage(points: np.ndarray) -> np.ndarray:
+        return points[np.all((points >= box_min) & (points <= box_max), axis=1)]
+    stage.__name__ = 'within_box'
+    return stage
+
+def within(predicate):
+    """Creates a stage keeping only the points of a chunk for which a batched predicate holds,
+    e.g. SignedDistanceGrid.inside.
+    ARGS:
+        predicate (callable): maps (K, 3) arrays to boolean masks of shape (K,)
+    RETURNS:
+        stage (callable): maps (K, 3) arrays to filtered (L, 3) arrays
+    """
+    def stage(points: np.ndarray) -> np.ndarray:
+        return points[predicate(points)]
+    stage.__name__ = 'within'
+    return stage
+
+
+class MinMax:
+    """Sink reducing chunks to their element-wise minimum and maximum"""
+
+    def __init__(self):
+        self.__min = None
+        self.__max = None
+
+    def update(self, chunk: np.ndarray):
+        if not len(chunk):
+            return
+        c_min, c_max = chunk.min(axis=0), chunk.max(axis=0)
+        self.__min = c_min if self.__min is None else np.minimum(self.__min, c_min)
+        self.__max = c_max if self.__max is None else np.maximum(self.__max, c_max)
+
+    def finish(self) -> tuple:
+        """RETURNS:
+            minimum, maximum: element-wise extremes, None if no data was received
+        """
+        return self.__min, self.__max
+
+
+class Histogram:
+    """Sink reducing chunks of scalars to a histogram with fixed bins"""
+
+    def __init__(self, bins: int, value_range: tuple):
+        """ARGS:
+            bins (int): number of bins
+            value_range (tuple): lower and upper bound of the histogram, values outside are not counted
+        """
+        self.__edges = np.linspace(value_range[0], value_range[1], bins + 1)
+        self.__counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, chunk: np.ndarray):
+        self.__counts += np.histogram(np.ravel(chunk), self.__edges)[0]
+
+    def finish(self) -> tuple:
+        """RETURNS:
+            counts (np.ndarray): counts per bin
+            edges (np.ndarray): bin edges
+        """
+        return self.__counts, self.__edges
+
+
+class Count:
+    """Sink counting the rows of all chunks"""
+
+    def __init__(self):
+        self.__count = 0
+
+    def update(self, chunk: np.ndarray):
+        self.__count += len(chunk)
+
+    def finish(self) -> int:
+        return self.__count
+
+
+class BinaryWriter:
+    """Sink appending chunks to a raw binary file"""
+
+    def __init__(self, path: str, dtype: str = '<f4'):
+        """ARGS:
+            path (str): path to the output file, overwritten if it exists
+            dtype (str): numpy data type written to the file (default: '<f4', little endian float32)
+        """
+        self.__file = open(path, 'wb')
+        self.__dtype = dtype
+        self.__rows = 0
+
+    def update(self, chunk: np.ndarray):
+        np.asarray(chunk, dtype=self.__dtype).tofile(self.__file)
+        self.__rows += len(chunk)
+
+    def finish(self) -> int:
+        """Closes the file.
+        RETURNS:
+            rows (int): number of rows written
+        """
+        self.__file.close()
+        return self.__rows
+
+
+class TextWriter:
+    """Sink appending chunks to a text file, one row per line"""
+
+    def __init__(self, path: str, delimiter: str = ' ', fmt: str = '%.9g'):
+        """ARGS:
+            path (str): path to the output file, overwritten if it exists
+            delimiter (str): column delimiter (default: ' ')
+            fmt (str): number format (default: '%.9g')
+        """
+        self.__file = open(path, 'w')
+        self.__delimiter = delimiter
+        self.__fmt = fmt
+        self.__rows = 0
+
+    def update(self, chunk: np.ndarray):
+        np.savetxt(self.__file, np.asarray(chunk).reshape(len(chunk), -1), fmt=self.__fmt, delimiter=self.__delimiter)
+        self.__rows += len(chunk)
+
+    def finish(self) -> int:
+        """Closes the file.
+        RETURNS:
+            rows (int): number of rows written
+        """
+        self.__file.close()
+        return self.__rows
+
+
+class Pipeline:
+    """Chain of stages applied to a stream of point chunks, with per-stage statistics"""
+
+    def __init__(self, source, *stages, trace_memory: bool = True):
+        """Creates pipeline. Nothing is read before the pipeline is iterated or run.
+        ARGS:
+            source: iterable of (K, 3) arrays, e.g. from read_points
+            *stages: callables mapping one chunk to the next
+            trace_memory (bool): measure the peak memory allocated by every stage with tracemalloc while the
+                pipeline runs (default: True)
+        """
+        for stage in stages:
+            if not callable(stage):
+                raise TypeError("Pipeline stages have to be callable.")
+        self.__source = source
+        self.__stages = stages
+        self.__trace_memory = trace_memory
+        names = ['read'] + [getattr(stage, '__name__', type(stage).__name__) for stage in stages]
+        self.__stats = [{'stage': name, 'chunks': 0, 'rows_in': 0, 'rows_out': 0, 'seconds': 0.0, 'peak_mb': None}
+                        for name in names]
+
+    def __record(self, stat: dict, rows_in: int, rows_out: int, seconds: float, peak: float):
+        stat['chunks'] += 1
+        stat['rows_in'] += rows_in
+        stat['rows_out'] += rows_out
+        stat['seconds'] += seconds
+        if peak is not None:
+            stat['peak_mb'] = max(stat['peak_mb'] or 0.0, peak)
+
+    def __iter__(self):
+        """Yields processed chunks. Only one chunk per stage is held in memory at a time."""
+        source = iter(self.__source)
+        started = self.__trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            while True:
+                chunk, seconds, peak = _traced_call(next, source, None)
+                if chunk is None:
+                    break
+                self.__record(self.__stats[0], len(chunk), len(chunk), seconds, peak)
+                for stage, stat in zip(self.__stages, self.__stats[1:]):
+                    result, seconds, peak = _traced_call(stage, chunk)
+                    self.__record(stat, len(chunk), len(result), seconds, peak)
+                    chunk = result
+                yield chunk
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    def run(self, *sinks) -> list:
+        """Runs the pipeline, passing every processed chunk to all sinks.
+        ARGS:
+            *sinks: objects with update(chunk) and finish() methods, e.g. MinMax, Histogram, BinaryWriter
+        RETURNS:
+            results (list): results of finish() of all sinks
+        """
+        for chunk in self:
+            for sink in sinks:
+                sink.update(chunk)
+        results = [sink.finish() for sink in sinks]
+        return results
+
+    @property
+    def stats(self) -> list:
+        """Statistics per stage as dicts: chunks, rows in/out, seconds, throughput in rows per second and
+        peak memory in MB allocated during a single call of the stage (None if not traced)"""
+        stats = []
+        for stat in self.__stats:
+            stat = dict(stat)
+            stat['throughput'] = stat['rows_in'] / stat['seconds'] if stat['seconds'] > 0 else None
+            stats.append(stat)
+        return stats
+
+    def report(self) -> str:
+        """Formats the stage statistics as a table.
+        RETURNS:
+            table (str): one line per stage
+        """
+        lines = [f"{'stage':<20}{'rows in':>14}{'rows out':>14}{'seconds':>10}{'rows/s':>14}{'peak MB':>13}"]
+        for stat in self.stats:
+            throughput = f"{stat['throughput']:.3g}" if stat['throughput'] is not None else '-'
+            peak = f"{stat['peak_mb']:.1f}" if stat['peak_mb'] is not None else '-'
+            lines.append(f"{stat['stage']:<20}{stat['rows_in']:>14}{stat['rows_out']:>14}{stat['seconds']:>10.3f}"
+                         f"{throughput:>14}{peak:>13}")
+        table = "\n".join(lines)
+        return table
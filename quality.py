@@ -0,0 +1,205 @@
+"""Mesh quality metrics and validation.
+
+Copyright (c) 2020 N.Wichmann
+
+Licensed under the Mozilla Public License 2.0
+(see attached License.txt or https://www.mozilla.org/en-US/MPL/2.0/)
+"""
+
+import numpy as np
+
+from meshtypes import as_indexed_mesh
+
+
+def face_quality(mesh, tolerance: float = 1e-12) -> tuple:
+    """Calculates shape metrics of all faces of a mesh.
+    ARGS:
+        mesh: IndexedMesh or list of Face objects
+        tolerance (float): faces with twice their area below tolerance times the squared longest edge are
+            degenerated (default: 1e-12)
+    RETURNS:
+        area (np.ndarray): face areas of shape (F,)
+        aspect_ratio (np.ndarray): longest edge over twice the inradius times sqrt(3), 1 for equilateral faces,
+            inf for degenerated faces, shape (F,)
+        min_angle (np.ndarray): smallest interior angle in degrees, shape (F,)
+        degenerated (np.ndarray): True for faces without area, shape (F,)
+    """
+    mesh = as_indexed_mesh(mesh)
+    a, b, c = mesh.corners
+    edges = np.stack((b - a, c - b, a - c))
+    length = np.linalg.norm(edges, axis=2)
+    double_area = np.linalg.norm(mesh.normals, axis=1)
+    area = 0.5 * double_area
+    longest = length.max(axis=0)
+    degenerated = double_area <= tolerance * longest * longest
+
+    # the angle at every corner between its outgoing edge and the reversed incoming edge
+    cosine = -np.einsum('kij,kij->ki', edges, np.roll(edges, 1, axis=0))
+    min_angle = np.degrees(np.arctan2(double_area, cosine).min(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # inradius r = 2 A / perimeter, normalized by the inradius of the equilateral triangle
+        aspect_ratio = longest * length.sum(axis=0) / (2.0 * np.sqrt(3.0) * double_area)
+    aspect_ratio[degenerated] = np.inf
+    min_angle[degenerated] = 0.0
+    return area, aspect_ratio, min_angle, degenerated
+
+def duplicate_faces(mesh) -> np.ndarray:
+    """Finds faces using the same three vertices as an earlier face, regardless of order and orientation.
+    ARGS:
+        mesh: IndexedMesh or list of Face objects
+    RETURNS:
+        face_ids (np.ndarray): sorted indices of the repeated faces
+    """
+    mesh = as_indexed_mesh(mesh)
+    tris = np.sort(mesh.triangles, axis=1)
+    n = max(len(mesh.vertices), 1)
+    if n ** 3 < np.iinfo(np.int64).max:
+        _, first = np.unique((tris[:, 0] * n + tris[:, 1]) * n + tris[:, 2], return_index=True)
+    else:
+        _, first = np.unique(tris, axis=0, return_index=True)
+    repeated = np.ones(len(tris), dtype=bool)
+    repeated[first] = False
+    face_ids = np.nonzero(repeated)[0]
+    return face_ids
+
+def edge_analysis(mesh) -> tuple:
+    """Classifies the edges of a mesh by their use in faces.
+    ARGS:
+        mesh: IndexedMesh or list of Face objects
+    RETURNS:
+        boundary (np.ndarray): vertex indices of edges used by one face only (open boundaries), shape (B, 2)
+        non_manifold (np.ndarray): vertex indices of edges used by more than two faces, shape (K, 2)
+        misoriented (np.ndarray): vertex indices of directed edges traversed in the same direction by more than
+            one face, i.e. between faces of opposite orientation, shape (L, 2)
+    """
+    mesh = as_indexed_mesh(mesh)
+    tris = mesh.triangles
+    start = tris.ravel()
+    end = tris[:, [1, 2, 0]].ravel()
+    n = np.int64(max(len(mesh.vertices), 1))
+    # edges encoded as single integers sort much faster than rows
+    key = np.minimum(start, end) * n + np.maximum(start, end)
+    edge, uses = np.unique(key, return_counts=True)
+    directed, directed_uses = np.unique(start * n + end, return_counts=True)
+
+    decode = lambda k: np.column_stack((k // n, k % n))
+    boundary = decode(edge[uses == 1])
+    non_manifold = decode(edge[uses > 2])
+    misoriented = decode(directed[directed_uses > 1])
+    return boundary, non_manifold, misoriented
+
+
+class MeshReport:
+    """Quality metrics and topology checks of a triangle mesh, computed on creation"""
+
+    def __init__(self, mesh, sliver_angle: float = 10.0, tolerance: float = 1e-12):
+        """Analyzes a mesh.
+        ARGS:
+            mesh: IndexedMesh or list of Face objects
+            sliver_angle (float): non-degenerated faces with a smaller minimum angle in degrees are slivers
+                (default: 10)
+            tolerance (float): relative area tolerance for degenerated faces, see face_quality (default: 1e-12)
+        """
+        mesh = as_indexed_mesh(mesh)
+        self.__n_faces = len(mesh.triangles)
+        self.__n_vertices = len(mesh.vertices)
+        self.__area, self.__aspect_ratio, self.__min_angle, self.__degenerated = face_quality(mesh, tolerance)
+        self.__sliver = (self.__min_angle < sliver_angle) & ~self.__degenerated
+        self.__duplicates = duplicate_faces(mesh)
+        self.__boundary_edges, self.__non_manifold_edges, self.__misoriented_edges = edge_analysis(mesh)
+        referenced = np.zeros(self.__n_vertices, dtype=bool)
+        referenced[mesh.triangles.ravel()] = True
+        self.__unused_vertices = np.nonzero(~referenced)[0]
+        # sum of signed tetrahedra volumes to the origin, positive for closed meshes with outward normals
+        a, _, _ = mesh.corners
+        self.__volume = float(np.einsum('ij,ij->', a, mesh.normals) / 6.0)
+
+    @property
+    def area(self) -> np.ndarray:
+        return self.__area
+
+    @property
+    def aspect_ratio(self) -> np.ndarray:
+        return self.__aspect_ratio
+
+    @property
+    def min_angle(self) -> np.ndarray:
+        return self.__min_angle
+
+    @property
+    def degenerated(self) -> np.ndarray:
+        return self.__degenerated
+
+    @property
+    def sliver(self) -> np.ndarray:
+        return self.__sliver
+
+    @property
+    def duplicates(self) -> np.ndarray:
+        return self.__duplicates
+
+    @property
+    def boundary_edges(self) -> np.ndarray:
+        return self.__boundary_edges
+
+    @property
+    def non_manifold_edges(self) -> np.ndarray:
+        return self.__non_manifold_edges
+
+    @property
+    def misoriented_edges(self) -> np.ndarray:
+        return self.__misoriented_edges
+
+    @property
+    def unused_vertices(self) -> np.ndarray:
+        return self.__unused_vertices
+
+    @property
+    def volume(self) -> float:
+        """Enclosed volume, only meaningful for watertight and consistently oriented meshes"""
+        return self.__volume
+
+    @property
+    def watertight(self) -> bool:
+        """True if every edge is used by exactly two faces"""
+        return not len(self.__boundary_edges) and not len(self.__non_manifold_edges)
+
+    @property
+    def consistent(self) -> bool:
+        """True if neighboring faces share their orientation, i.e. every directed edge is used at most once"""
+        return not len(self.__misoriented_edges)
+
+    @property
+    def summary(self) -> dict:
+        """Counts of all findings and statistics of the face metrics"""
+        valid = ~self.__degenerated
+        summary = {
+            'faces': self.__n_faces,
+            'vertices': self.__n_vertices,
+            'unused_vertices': len(self.__unused_vertices),
+            'degenerated_faces': int(self.__degenerated.sum()),
+            'sliver_faces': int(self.__sliver.sum()),
+            'duplicate_faces': len(self.__duplicates),
+            'boundary_edges': len(self.__boundary_edges),
+            'non_manifold_edges': len(self.__non_manifold_edges),
+            'misoriented_edges': len(self.__misoriented_edges),
+            'watertight': self.watertight,
+            'consistent': self.consistent,
+            'area': float(self.__area.sum()),
+            'volume': self.__volume,
+            'min_angle': float(self.__min_angle[valid].min()) if valid.any() else None,
+            'max_aspect_ratio': float(self.__aspect_ratio[valid].max()) if valid.any() else None,
+        }
+        return summary
+
+    def report(self) -> str:
+        """Formats the summary as a table.
+        RETURNS:
+            table (str): one line per entry
+        """
+        lines = []
+        for name, value in self.summary.items():
+            value = f"{value:.6g}" if type(value) == float else str(value)
+            lines.append(f"{name:<20}{value:>14}")
+        table = "\n".join(lines)
+        return table
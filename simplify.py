@@ -0,0 +1,211 @@
+"""Mesh simplification by quadric error metrics.
+
+Copyright (c) 2020 N.Wichmann
+
+Licensed under the Mozilla Public License 2.0
+(see attached License.txt or https://www.mozilla.org/en-US/MPL/2.0/)
+"""
+
+import heapq
+from itertools import count
+
+import numpy as np
+
+from meshtypes import IndexedMesh
+from meshtypes import as_indexed_mesh
+
+
+def face_quadrics(vertices: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    """Calculates the fundamental error quadric of every face, i.e. the outer product of its plane equation.
+    ARGS:
+        vertices (np.ndarray): vertex coordinates of shape (V, 3)
+        triangles (np.ndarray): vertex indices of shape (F, 3)
+    RETURNS:
+        quadrics (np.ndarray): quadrics of shape (F, 4, 4), zero for degenerated faces
+    """
+    a, b, c = vertices[triangles[:, 0]], vertices[triangles[:, 1]], vertices[triangles[:, 2]]
+    normal = np.cross(b - a, c - a)
+    length = np.linalg.norm(normal, axis=1, keepdims=True)
+    normal = np.divide(normal, length, out=np.zeros_like(normal), where=length > 0)
+    plane = np.column_stack((normal, -np.einsum('ij,ij->i', normal, a)))
+    quadrics = plane[:, :, None] * plane[:, None, :]
+    return quadrics
+
+def boundary_quadrics(vertices: np.ndarray, triangles: np.ndarray, weight: float = 1.0) -> tuple:
+    """Calculates constraint quadrics of the open boundary edges of a mesh: the planes through each boundary edge
+    perpendicular to its face, which penalize moving boundary vertices away from the boundary.
+    ARGS:
+        vertices (np.ndarray): vertex coordinates of shape (V, 3)
+        triangles (np.ndarray): vertex indices of shape (F, 3)
+        weight (float): weight of the constraint planes relative to the face planes (default: 1.0)
+    RETURNS:
+        edges (np.ndarray): vertex indices of the boundary edges, shape (B, 2)
+        quadrics (np.ndarray): quadrics of shape (B, 4, 4), zero for degenerated edges or faces
+    """
+    n_faces = len(triangles)
+    half_edges = np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]))
+    _, inverse, uses = np.unique(np.sort(half_edges, axis=1), axis=0, return_inverse=True, return_counts=True)
+    boundary = np.nonzero(uses[inverse.ravel()] == 1)[0]
+    edges = half_edges[boundary]
+    tri = vertices[triangles[boundary % n_faces]]
+    face_normal = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    a = vertices[edges[:, 0]]
+    normal = np.cross(vertices[edges[:, 1]] - a, face_normal)
+    length = np.linalg.norm(normal, axis=1, keepdims=True)
+    normal = np.divide(normal, length, out=np.zeros_like(normal), where=length > 0)
+    plane = np.column_stack((normal, -np.einsum('ij,ij->i', normal, a)))
+    quadrics = weight * plane[:, :, None] * plane[:, None, :]
+    return edges, quadrics
+
+def _normals(corners: np.ndarray) -> np.ndarray:
+    """Non-normalized normals of triangles given by corners of shape (F, 3, 3); avoids the overhead of np.cross."""
+    u = corners[:, 1] - corners[:, 0]
+    v = corners[:, 2] - corners[:, 0]
+    normals = np.empty_like(u)
+    normals[:, 0] = u[:, 1] * v[:, 2] - u[:, 2] * v[:, 1]
+    normals[:, 1] = u[:, 2] * v[:, 0] - u[:, 0] * v[:, 2]
+    normals[:, 2] = u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+    return normals
+
+def _collapse_targets(quadrics: np.ndarray, pos_a: np.ndarray, pos_b: np.ndarray, fixed: np.ndarray) -> tuple:
+    """Finds the position minimizing the summed quadric for a batch of edges.
+    Candidates are the solution of the quadric's linear system, both end points and the midpoint.
+    Edges with a fixed first end point keep its position.
+    ARGS:
+        quadrics (np.ndarray): summed quadrics of both end points, shape (E, 4, 4)
+        pos_a, pos_b (np.ndarray): end points of shape (E, 3)
+        fixed (np.ndarray): True where the first end point must not move, shape (E,)
+    RETURNS:
+        cost (np.ndarray): quadric error at the target, shape (E,)
+        target (np.ndarray): target positions of shape (E, 3)
+    """
+    a_mat, b_vec, c_val = quadrics[:, :3, :3], quadrics[:, :3, 3], quadrics[:, 3, 3]
+    optimum = 0.5 * (pos_a + pos_b)
+    det = np.linalg.det(a_mat)
+    solvable = np.abs(det) > 1e-12 * np.maximum(np.abs(a_mat).max(axis=(1, 2)), 1e-300) ** 3
+    if solvable.any():
+        optimum[solvable] = np.linalg.solve(a_mat[solvable], -b_vec[solvable, :, None])[:, :, 0]
+    candidates = np.stack((pos_a, pos_b, 0.5 * (pos_a + pos_b), optimum))
+    # x^T A x + 2 b.x + c for all candidates at once
+    costs = np.einsum('kei,eij,kej->ke', candidates, a_mat, candidates) + \
+        2.0 * np.einsum('kei,ei->ke', candidates, b_vec) + c_val
+    costs = np.maximum(costs, 0.0)
+    costs[1:, fixed] = np.inf
+    best = np.argmin(costs, axis=0)
+    rows = np.arange(len(best))
+    target = candidates[best, rows]
+    return costs[best, rows], target
+
+def decimate(mesh, target_faces: int = None, max_error: float = None, preserve_boundary: bool = False,
+             boundary_weight: float = 1.0) -> tuple:
+    """Simplifies a mesh by repeated edge collapses in order of increasing quadric error.
+    Collapses that would create non-manifold connectivity, flip a face or remove the last face are skipped.
+    ARGS:
+        mesh: IndexedMesh or list of Face objects
+        target_faces (int): stop once the mesh has at most this many faces (default: None)
+        max_error (float): stop before a collapse whose error exceeds this bound; the error is the square root of
+            the summed squared distances of the new vertex to the planes of its original faces and, for vertices
+            on open boundaries, to the constraint planes of their boundary edges (default: None)
+        preserve_boundary (bool): keep vertices on open boundaries in place and never collapse boundary edges
+            (default: False)
+        boundary_weight (float): weight of the boundary constraint planes, see boundary_quadrics (default: 1.0)
+    RETURNS:
+        simplified (IndexedMesh): simplified mesh
+        error (float): largest error of all performed collapses
+    """
+    if target_faces is None and max_error is None:
+        raise ValueError("decimate needs a target face count, an error bound or both.")
+    mesh = as_indexed_mesh(mesh)
+    verts = np.array(mesh.vertices, dtype=float)
+    tris = np.array(mesh.triangles)
+    target_faces = 1 if target_faces is None else max(target_faces, 1)
+    max_cost = np.inf if max_error is None else max_error ** 2
+
+    quadrics = np.zeros((len(verts), 4, 4))
+    face_q = face_quadrics(verts, tris)
+    for k in range(3):
+        np.add.at(quadrics, tris[:, k], face_q)
+    # without constraints, moving boundary vertices along their faces' planes would cost nothing
+    boundary_edges, boundary_q = boundary_quadrics(verts, tris, boundary_weight)
+    for k in range(2):
+        np.add.at(quadrics, boundary_edges[:, k], boundary_q)
+
+    edges = np.sort(np.concatenate((tris[:, [0, 1]], tris[:, [1, 2]], tris[:, [2, 0]])), axis=1)
+    edges, edge_uses = np.unique(edges, axis=0, return_counts=True)
+    locked = np.zeros(len(verts), dtype=bool)
+    if preserve_boundary:
+        locked[edges[edge_uses == 1].ravel()] = True
+
+    # connectivity is kept in Python containers, which are faster than small array operations per collapse
+    tris = tris.tolist()
+    vert_faces = [set() for _ in range(len(verts))]
+    for f, tri in enumerate(tris):
+        for v in tri:
+            vert_faces[v].add(f)
+    version = np.zeros(len(verts), dtype=np.int64)
+    alive_face = np.ones(len(tris), dtype=bool)
+    n_faces = len(tris)
+    tie = count()
+    heap = []
+
+    def push(u_ids: np.ndarray, v_ids: np.ndarray):
+        """Orients edges so that a locked vertex comes first and queues their collapses."""
+        swap = locked[v_ids] & ~locked[u_ids]
+        u_ids, v_ids = np.where(swap, v_ids, u_ids), np.where(swap, u_ids, v_ids)
+        movable = ~(locked[u_ids] & locked[v_ids])
+        u_ids, v_ids = u_ids[movable], v_ids[movable]
+        if not len(u_ids):
+            return
+        cost, target = _collapse_targets(quadrics[u_ids] + quadrics[v_ids], verts[u_ids], verts[v_ids],
+                                         locked[u_ids])
+        for c, u, v, t in zip(cost.tolist(), u_ids.tolist(), v_ids.tolist(), target.tolist()):
+            heapq.heappush(heap, (c, next(tie), u, v, version[u], version[v], t))
+
+    push(edges[:, 0], edges[:, 1])
+    error = 0.0
+    while heap and n_faces > target_faces:
+        cost, _, u, v, ver_u, ver_v, target = heapq.heappop(heap)
+        if ver_u != version[u] or ver_v != version[v]:
+            continue
+        if cost > max_cost:
+            break
+        shared = vert_faces[u] & vert_faces[v]
+        if not shared or len(shared) >= n_faces:
+            continue
+        # link condition: common neighbors of u and v are exactly the opposite vertices of their shared faces
+        neighbors_u = {w for f in vert_faces[u] for w in tris[f]} - {u}
+        neighbors_v = {w for f in vert_faces[v] for w in tris[f]} - {v}
+        opposite = {w for f in shared for w in tris[f]} - {u, v}
+        if neighbors_u & neighbors_v != opposite:
+            continue
+        # no remaining face may flip its orientation
+        moved = np.array([tris[f] for f in (vert_faces[u] | vert_faces[v]) - shared], dtype=np.int64)
+        if len(moved):
+            corners = verts[moved]
+            old_normal = _normals(corners)
+            corners[(moved == u) | (moved == v)] = target
+            if np.any(np.einsum('ij,ij->i', old_normal, _normals(corners)) <= 0):
+                continue
+
+        verts[u] = target
+        quadrics[u] += quadrics[v]
+        for f in shared:
+            alive_face[f] = False
+            for w in tris[f]:
+                vert_faces[w].discard(f)
+        n_faces -= len(shared)
+        for f in vert_faces[v]:
+            tris[f] = [u if w == v else w for w in tris[f]]
+        vert_faces[u] |= vert_faces[v]
+        vert_faces[v] = set()
+        version[u] += 1
+        version[v] += 1
+        error = max(error, cost)
+        neighbors = np.array(sorted((neighbors_u | neighbors_v) - {u, v}), dtype=np.int64)
+        push(np.full(len(neighbors), u), neighbors)
+
+    # drop removed faces and unreferenced vertices
+    tris = np.array(tris, dtype=np.int64).reshape(-1, 3)[alive_face]
+    used, remap = np.unique(tris, return_inverse=True)
+    simplified = IndexedMesh(verts[used], remap.reshape(-1, 3))
+    return simplified, float(np.sqrt(error))
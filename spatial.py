@@ -0,0 +1,385 @@
+"""Spatial acceleration structures for batched geometry queries.
+
+Copyright (c) 2020 N.Wichmann
+
+Licensed under the Mozilla Public License 2.0
+(see attached License.txt or https://www.mozilla.org/en-US/MPL/2.0/)
+"""
+
+import numpy as np
+import utility
+
+
+def box_dist_sq(points: np.ndarray, box_min: np.ndarray, box_max: np.ndarray) -> np.ndarray:
+    """Calculates the squared distance between points and axis aligned boxes.
+    ARGS:
+        points (np.ndarray): points of shape (N, 3)
+        box_min, box_max (np.ndarray): box corners of shape (N, 3) or (3,)
+    RETURNS:
+        dist_sq (np.ndarray): squared distances of shape (N,), 0 for points inside the box
+    """
+    delta = np.maximum(np.maximum(box_min - points, points - box_max), 0.0)
+    dist_sq = np.einsum('ij,ij->i', delta, delta)
+    return dist_sq
+
+
+class AABBTree:
+    """Bounding volume hierarchy of axis aligned bounding boxes over a set of primitives"""
+    _dimension = 3
+
+    def __init__(self, box_min: np.ndarray, box_max: np.ndarray, leaf_size: int = 8):
+        """Builds the tree from the bounding boxes of the primitives.
+        The tree is built top-down, one level at a time, by splitting every node at the median of the primitive
+        centroids along the longest axis of the centroid bounds.
+        ARGS:
+            box_min, box_max (np.ndarray): corners of the primitive bounding boxes, shape (N, 3)
+            leaf_size (int): maximum number of primitives per leaf node (default: 8)
+        """
+        box_min = np.asarray(box_min, dtype=float)
+        box_max = np.asarray(box_max, dtype=float)
+        if box_min.shape != box_max.shape or box_min.ndim != 2 or box_min.shape[1] != self._dimension:
+            raise ValueError(f"Expected bounding boxes of shape (N, {self._dimension})")
+        if len(box_min) == 0:
+            raise ValueError("AABBTree needs at least one primitive.")
+        if leaf_size < 1:
+            raise ValueError("Leaf size must be at least 1.")
+        self.__leaf_size = int(leaf_size)
+        self.__build(box_min, box_max)
+        self.refit(box_min, box_max)
+
+    def __build(self, box_min: np.ndarray, box_max: np.ndarray):
+        """Creates the node topology and the primitive order."""
+        n_prim = len(box_min)
+        centroids = 0.5 * (box_min + box_max)
+        order = np.arange(n_prim)
+
+        starts, counts, depths = [np.zeros(1, dtype=np.int64)], [np.array([n_prim])], [np.zeros(1, dtype=np.int64)]
+        lefts, rights = [], []
+        level_ids = np.zeros(1, dtype=np.int64)
+        level_start, level_count = starts[0], counts[0]
+        n_nodes, depth = 1, 0
+        while True:
+            split = level_count > self.__leaf_size
+            level_left = np.full(len(level_ids), -1, dtype=np.int64)
+            if split.any():
+                s_start, s_count = level_start[split], level_count[split]
+                # gather the primitive slots of all nodes to be split into one contiguous array
+                seg = np.repeat(np.arange(len(s_start)), s_count)
+                seg_offset = np.cumsum(s_count) - s_count
+                slots = s_start[seg] + np.arange(len(seg)) - seg_offset[seg]
+                cen = centroids[order[slots]]
+                extent = np.maximum.reduceat(cen, seg_offset) - np.minimum.reduceat(cen, seg_offset)
+                axis = np.argmax(extent, axis=1)
+                key = cen[np.arange(len(seg)), axis[seg]]
+                # sort all segments at once: the normalized key stays within [0, 0.5] of its segment id
+                key_min = np.minimum.reduceat(key, seg_offset)
+                key_ext = extent[np.arange(len(s_start)), axis]
+                key = seg + 0.5 * (key - key_min[seg]) / np.where(key_ext > 0, key_ext, 1.0)[seg]
+                order[slots] = order[slots][np.argsort(key)]
+
+                half = s_count // 2
+                child_ids = n_nodes + 2 * np.arange(len(s_start))
+                level_left[split] = child_ids
+                n_nodes += 2 * len(s_start)
+                depth += 1
+                next_ids = np.column_stack((child_ids, child_ids + 1)).ravel()
+                next_start = np.column_stack((s_start, s_start + half)).ravel()
+                next_count = np.column_stack((half, s_count - half)).ravel()
+            lefts.append(level_left)
+            rights.append(np.where(level_left >= 0, level_left + 1, -1))
+            if not split.any():
+                break
+            starts.append(next_start)
+            counts.append(next_count)
+            depths.append(np.full(len(next_ids), depth, dtype=np.int64))
+            level_ids, level_start, level_count = next_ids, next_start, next_count
+
+        self.__order = order
+        self.__node_start = np.concatenate(starts)
+        self.__node_count = np.concatenate(counts)
+        self.__node_depth = np.concatenate(depths)
+        self.__node_left = np.concatenate(lefts)
+        self.__node_right = np.concatenate(rights)
+        self.__leaves = np.nonzero(self.__node_left < 0)[0]
+        self.__leaves = self.__leaves[np.argsort(self.__node_start[self.__leaves])]
+        self.__node_parent = None
+        self.__prim_leaf = None
+
+    def refit(self, box_min: np.ndarray, box_max: np.ndarray, prim_ids: np.ndarray = None):
+        """Recalculates the node bounding boxes for updated primitive bounding boxes, keeping the tree topology.
+        ARGS:
+            box_min, box_max (np.ndarray): corners of the primitive bounding boxes, shape (N, 3),
+                in the same primitive order as used for building the tree
+            prim_ids (np.ndarray): indices of the changed primitives (default: None); if given, only the leaves
+                holding them and their ancestors are updated
+        """
+        box_min = np.asarray(box_min, dtype=float)
+        box_max = np.asarray(box_max, dtype=float)
+        if len(box_min) != len(self.__order) or len(box_max) != len(self.__order):
+            raise ValueError(f"Expected {len(self.__order)} bounding boxes, got {len(box_min)}")
+        if prim_ids is not None:
+            self.__refit_partial(box_min, box_max, np.asarray(prim_ids, dtype=np.int64).ravel())
+            return
+        n_nodes = len(self.__node_start)
+        node_min = np.empty((n_nodes, self._dimension))
+        node_max = np.empty((n_nodes, self._dimension))
+
+        leaf_starts = self.__node_start[self.__leaves]
+        node_min[self.__leaves] = np.minimum.reduceat(box_min[self.__order], leaf_starts)
+        node_max[self.__leaves] = np.maximum.reduceat(box_max[self.__order], leaf_starts)
+        internal = self.__node_left >= 0
+        for depth in range(self.__node_depth.max(), -1, -1):
+            nodes = np.nonzero(internal & (self.__node_depth == depth))[0]
+            left, right = self.__node_left[nodes], self.__node_right[nodes]
+            node_min[nodes] = np.minimum(node_min[left], node_min[right])
+            node_max[nodes] = np.maximum(node_max[left], node_max[right])
+        self.__node_min = node_min
+        self.__node_max = node_max
+
+    def __refit_partial(self, box_min: np.ndarray, box_max: np.ndarray, prim_ids: np.ndarray):
+        """Updates the leaves holding the given primitives and all their ancestors."""
+        if self.__node_parent is None:
+            parent = np.full(len(self.__node_start), -1, dtype=np.int64)
+            internal = np.nonzero(self.__node_left >= 0)[0]
+            parent[self.__node_left[internal]] = internal
+            parent[self.__node_right[internal]] = internal
+            prim_leaf = np.empty(len(self.__order), dtype=np.int64)
+            prim_leaf[self.__order] = np.repeat(self.__leaves, self.__node_count[self.__leaves])
+            self.__node_parent, self.__prim_leaf = parent, prim_leaf
+        if not len(prim_ids):
+            return
+        if not (self.__node_min.flags.writeable and self.__node_max.flags.writeable):
+            self.__node_min, self.__node_max = self.__node_min.copy(), self.__node_max.copy()
+
+        nodes = np.unique(self.__prim_leaf[prim_ids])
+        start, count = self.__node_start[nodes], self.__node_count[nodes]
+        seg_offset = np.cumsum(count) - count
+        seg = np.repeat(np.arange(len(nodes)), count)
+        slots = start[seg] + np.arange(len(seg)) - seg_offset[seg]
+        self.__node_min[nodes] = np.minimum.reduceat(box_min[self.__order[slots]], seg_offset)
+        self.__node_max[nodes] = np.maximum.reduceat(box_max[self.__order[slots]], seg_offset)
+        # ancestors on paths of different length are visited repeatedly, the last visit follows all child updates
+        nodes = np.unique(self.__node_parent[nodes])
+        nodes = nodes[nodes >= 0]
+        while len(nodes):
+            left, right = self.__node_left[nodes], self.__node_right[nodes]
+            self.__node_min[nodes] = np.minimum(self.__node_min[left], self.__node_min[right])
+            self.__node_max[nodes] = np.maximum(self.__node_max[left], self.__node_max[right])
+            nodes = np.unique(self.__node_parent[nodes])
+            nodes = nodes[nodes >= 0]
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, leaf_size: int):
+        """Recreates a tree from the arrays of arrays(), without copying them, e.g. from memory-mapped files.
+        ARGS:
+            arrays (dict): node and order arrays as returned by arrays()
+            leaf_size (int): leaf size the tree was built with
+        RETURNS:
+            tree (AABBTree): tree using the passed arrays
+        """
+        tree = cls.__new__(cls)
+        tree.__leaf_size = int(leaf_size)
+        tree.__order = arrays['order']
+        tree.__node_start = arrays['node_start']
+        tree.__node_count = arrays['node_count']
+        tree.__node_depth = arrays['node_depth']
+        tree.__node_left = arrays['node_left']
+        tree.__node_right = arrays['node_right']
+        tree.__leaves = arrays['leaves']
+        tree.__node_min = arrays['node_min']
+        tree.__node_max = arrays['node_max']
+        tree.__node_parent = None
+        tree.__prim_leaf = None
+        return tree
+
+    def arrays(self) -> dict:
+        """Returns all arrays defining the tree, e.g. for serialization.
+        RETURNS:
+            arrays (dict): node and order arrays by name
+        """
+        arrays = {'order': self.__order, 'node_start': self.__node_start, 'node_count': self.__node_count,
+                  'node_depth': self.__node_depth, 'node_left': self.__node_left, 'node_right': self.__node_right,
+                  'leaves': self.__leaves, 'node_min': self.__node_min, 'node_max': self.__node_max}
+        return arrays
+
+    @property
+    def leaf_size(self) -> int:
+        return self.__leaf_size
+
+    @property
+    def order(self) -> np.ndarray:
+        return self.__order
+
+    @property
+    def node_min(self) -> np.ndarray:
+        return self.__node_min
+
+    @property
+    def node_max(self) -> np.ndarray:
+        return self.__node_max
+
+    @property
+    def node_left(self) -> np.ndarray:
+        return self.__node_left
+
+    @property
+    def node_right(self) -> np.ndarray:
+        return self.__node_right
+
+    @property
+    def node_start(self) -> np.ndarray:
+        return self.__node_start
+
+    @property
+    def node_count(self) -> np.ndarray:
+        return self.__node_count
+
+    def leaf_pairs(self, query_ids: np.ndarray, nodes: np.ndarray) -> tuple:
+        """Expands pairs of query ids and leaf nodes into pairs of query ids and primitive ids.
+        ARGS:
+            query_ids (np.ndarray): query indices of shape (K,)
+            nodes (np.ndarray): leaf node indices of shape (K,)
+        RETURNS:
+            query_ids (np.ndarray): repeated query indices
+            prim_ids (np.ndarray): primitive indices contained in the respective leaf nodes
+        """
+        counts = self.__node_count[nodes]
+        offset = np.cumsum(counts) - counts
+        local = np.arange(counts.sum()) - np.repeat(offset, counts)
+        prim_ids = self.__order[np.repeat(self.__node_start[nodes], counts) + local]
+        return np.repeat(query_ids, counts), prim_ids
+
+    def nearest(self, points: np.ndarray, prim_dist, chunk_size: int = 65536) -> tuple:
+        """Finds the nearest primitive for every query point.
+        Pairs of query points and nodes are kept on a stack and processed in batches, nearer child nodes first.
+        Pairs whose bounding box is farther away than the best primitive found so far are pruned.
+        ARGS:
+            points (np.ndarray): query points of shape (N, 3)
+            prim_dist: callable taking (points (K, 3), prim_ids (K,)) and returning squared distances (K,)
+                and closest points (K, 3)
+            chunk_size (int): number of point-node pairs processed at once, bounds memory use (default: 65536)
+        RETURNS:
+            dist_sq (np.ndarray): squared distance to nearest primitive, shape (N,)
+            prim_ids (np.ndarray): index of nearest primitive, shape (N,)
+            closest (np.ndarray): closest points on nearest primitive, shape (N, 3)
+        """
+        points = np.asarray(points, dtype=float)
+        n_points = len(points)
+        best_dist = np.full(n_points, np.inf)
+        best_ids = np.full(n_points, -1, dtype=np.int64)
+        best_points = np.zeros((n_points, self._dimension))
+        left, right = self.__node_left, self.__node_right
+        query = np.arange(n_points)
+
+        # greedy descent to a first leaf to get a tight initial bound
+        seed = np.zeros(n_points, dtype=np.int64)
+        active = query
+        while active.size:
+            active = active[left[seed[active]] >= 0]
+            l_node, r_node = left[seed[active]], right[seed[active]]
+            p = points[active]
+            d_l = box_dist_sq(p, self.__node_min[l_node], self.__node_max[l_node])
+            d_r = box_dist_sq(p, self.__node_min[r_node], self.__node_max[r_node])
+            seed[active] = np.where(d_l <= d_r, l_node, r_node)
+        for c0 in range(0, n_points, chunk_size):
+            c1 = min(c0 + chunk_size, n_points)
+            self.__evaluate_leaves(prim_dist, points, query[c0:c1], seed[c0:c1], best_dist, best_ids, best_points)
+
+        stack = _PairStack(query[::-1], np.zeros(n_points, dtype=np.int64))
+        while len(stack):
+            query, nodes = stack.pop(chunk_size)
+            d_box = box_dist_sq(points[query], self.__node_min[nodes], self.__node_max[nodes])
+            keep = (d_box < best_dist[query]) & (nodes != seed[query])
+            query, nodes = query[keep], nodes[keep]
+            is_leaf = left[nodes] < 0
+            self.__evaluate_leaves(prim_dist, points, query[is_leaf], nodes[is_leaf],
+                                   best_dist, best_ids, best_points)
+            query, nodes = query[~is_leaf], nodes[~is_leaf]
+            l_node, r_node = left[nodes], right[nodes]
+            p = points[query]
+            l_first = box_dist_sq(p, self.__node_min[l_node], self.__node_max[l_node]) <= \
+                box_dist_sq(p, self.__node_min[r_node], self.__node_max[r_node])
+            near, far = np.where(l_first, l_node, r_node), np.where(l_first, r_node, l_node)
+            stack.push(np.concatenate((query, query)), np.concatenate((far, near)))
+        return best_dist, best_ids, best_points
+
+    def overlap_pairs(self, other, chunk_size: int = 65536, margin: float = 0.0):
+        """Finds all pairs of primitives of two trees whose leaf node bounding boxes overlap.
+        Pairs of nodes are kept on a stack and processed in batches, always descending into the larger node.
+        ARGS:
+            other (AABBTree): second tree
+            chunk_size (int): number of node pairs processed at once, bounds memory use (default: 65536)
+            margin (float): boxes separated by up to this gap count as overlapping (default: 0.0)
+        YIELDS:
+            prim_a (np.ndarray): primitive indices of this tree
+            prim_b (np.ndarray): primitive indices of the other tree, candidates for overlap with prim_a
+        """
+        utility.argcheck_type([AABBTree], other)
+        stack = _PairStack(np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
+        while len(stack):
+            node_a, node_b = stack.pop(chunk_size)
+            overlap = np.all((self.__node_min[node_a] <= other.node_max[node_b] + margin) &
+                             (other.node_min[node_b] <= self.__node_max[node_a] + margin), axis=1)
+            node_a, node_b = node_a[overlap], node_b[overlap]
+            leaf_a, leaf_b = self.__node_left[node_a] < 0, other.node_left[node_b] < 0
+            both = leaf_a & leaf_b
+            if both.any():
+                pair_ids, prim_a = self.leaf_pairs(np.arange(both.sum()), node_a[both])
+                entry_ids, prim_b = other.leaf_pairs(np.arange(len(pair_ids)), node_b[both][pair_ids])
+                yield prim_a[entry_ids], prim_b
+
+            node_a, node_b, leaf_a, leaf_b = node_a[~both], node_b[~both], leaf_a[~both], leaf_b[~both]
+            size_a = np.sum(self.__node_max[node_a] - self.__node_min[node_a], axis=1)
+            size_b = np.sum(other.node_max[node_b] - other.node_min[node_b], axis=1)
+            split_a = ~leaf_a & (leaf_b | (size_a >= size_b))
+            a, b = node_a[split_a], node_b[split_a]
+            stack.push(np.concatenate((self.__node_left[a], self.__node_right[a])), np.concatenate((b, b)))
+            a, b = node_a[~split_a], node_b[~split_a]
+            stack.push(np.concatenate((a, a)), np.concatenate((other.node_left[b], other.node_right[b])))
+
+    def __evaluate_leaves(self, prim_dist, points, query, nodes, best_dist, best_ids, best_points):
+        """Evaluates all primitives of the given leaves and keeps the nearest ones per query point."""
+        if not query.size:
+            return
+        query, prims = self.leaf_pairs(query, nodes)
+        d_sq, cp = prim_dist(points[query], prims)
+        sort = np.lexsort((d_sq, query))
+        query, prims, d_sq, cp = query[sort], prims[sort], d_sq[sort], cp[sort]
+        first = np.ones(len(query), dtype=bool)
+        first[1:] = query[1:] != query[:-1]
+        query, prims, d_sq, cp = query[first], prims[first], d_sq[first], cp[first]
+        better = d_sq < best_dist[query]
+        query = query[better]
+        best_dist[query] = d_sq[better]
+        best_ids[query] = prims[better]
+        best_points[query] = cp[better]
+
+
+class _PairStack:
+    """Growable stack of (query, node) index pairs for batched depth-first tree traversal"""
+
+    def __init__(self, query: np.ndarray, nodes: np.ndarray):
+        self.__query = np.array(query, dtype=np.int64)
+        self.__nodes = np.array(nodes, dtype=np.int64)
+        self.__top = len(self.__query)
+
+    def __len__(self) -> int:
+        return self.__top
+
+    def push(self, query: np.ndarray, nodes: np.ndarray):
+        """Pushes pairs onto the stack, the last pair is popped first."""
+        new_top = self.__top + len(query)
+        if new_top > len(self.__query):
+            size = max(new_top, 2 * len(self.__query))
+            self.__query = np.resize(self.__query, size)
+            self.__nodes = np.resize(self.__nodes, size)
+        self.__query[self.__top:new_top] = query
+        self.__nodes[self.__top:new_top] = nodes
+        self.__top = new_top
+
+    def pop(self, count: int) -> tuple:
+        """Pops up to count pairs from the top of the stack."""
+        bottom = max(self.__top - count, 0)
+        pairs = self.__query[bottom:self.__top].copy(), self.__nodes[bottom:self.__top].copy()
+        self.__top = bottom
+        return pairs
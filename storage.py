@@ -0,0 +1,201 @@
+"""Compact binary storage of geometry collections with memory-mapped, zero-copy loading.
+
+File layout: magic bytes, format version, little endian uint64 header length, JSON header, raw arrays.
+The header lists name, dtype, shape and byte offset of every array. Arrays start at 64 byte aligned offsets
+and are stored in C order, so that they can be memory-mapped directly.
+
+Copyright (c) 2020 N.Wichmann
+
+Licensed under the Mozilla Public License 2.0
+(see attached License.txt or https://www.mozilla.org/en-US/MPL/2.0/)
+"""
+
+import json
+import struct
+
+import numpy as np
+import utility
+import spatial
+
+from mathtypes import Point
+from mathtypes import Line
+from mathtypes import Plane
+from meshtypes import Vertex
+from meshtypes import Edge
+from meshtypes import Face
+from meshtypes import IndexedMesh
+from meshtypes import as_indexed_mesh
+from uvtypes import UVPoint
+from uvtypes import UVTriangle
+
+
+_magic = b'GEOU3D'
+_version = 1
+_alignment = 64
+
+# conversion of primitive objects to stacked arrays and back
+_primitives = {
+    'Point': (Point, lambda o: [o.coords], lambda a: Point(a[0])),
+    'Vertex': (Vertex, lambda o: [o.coords], lambda a: Vertex(a[0])),
+    'UVPoint': (UVPoint, lambda o: [o.coords], lambda a: UVPoint(a[0])),
+    'Line': (Line, lambda o: [o.point_a, o.point_b], lambda a: Line(a[0], a[1], 'point')),
+    'Edge': (Edge, lambda o: [o.vertex_a.coords, o.vertex_b.coords], lambda a: Edge(a[0], a[1])),
+    'Plane': (Plane, lambda o: [o.point_a, o.point_b, o.point_c], lambda a: Plane(a[0], a[1], a[2], 'point')),
+    'Face': (Face, lambda o: [o.vertex_a.coords, o.vertex_b.coords, o.vertex_c.coords],
+             lambda a: Face(a[0], a[1], a[2])),
+    'UVTriangle': (UVTriangle, lambda o: [o.point_a.coords, o.point_b.coords, o.point_c.coords],
+                   lambda a: UVTriangle(a[0], a[1], a[2])),
+}
+
+
+def save(path: str, kind: str = 'arrays', meta: dict = None, **arrays):
+    """Writes named arrays to a file.
+    ARGS:
+        path (str): path to the file, overwritten if it exists
+        kind (str): content type stored in the header, checked by the typed loaders (default: 'arrays')
+        meta (dict): additional JSON serializable header entries (default: None)
+        **arrays: arrays to be stored by name
+    """
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    header = {'kind': kind, 'meta': meta or {}, 'arrays': {}}
+    # offsets are relative to the aligned start of the data block, which depends on the header length
+    offset = 0
+    for name, a in arrays.items():
+        dtype = a.dtype.newbyteorder('<') if a.dtype.byteorder == '>' else a.dtype
+        header['arrays'][name] = {'dtype': dtype.str, 'shape': list(a.shape), 'offset': offset}
+        offset += -(-a.nbytes // _alignment) * _alignment
+    header_bytes = json.dumps(header).encode('utf-8')
+    prefix = len(_magic) + 1 + 8
+    data_start = -(-(prefix + len(header_bytes)) // _alignment) * _alignment
+
+    with open(path, 'wb') as file:
+        file.write(_magic + struct.pack('<BQ', _version, len(header_bytes)) + header_bytes)
+        for name, a in arrays.items():
+            file.seek(data_start + header['arrays'][name]['offset'])
+            a.astype(header['arrays'][name]['dtype'], copy=False).tofile(file)
+        file.truncate(data_start + offset)
+
+def load(path: str, mmap: bool = True) -> tuple:
+    """Opens a file written by save. Only the header is read, memory-mapped arrays are read lazily on access.
+    ARGS:
+        path (str): path to the file
+        mmap (bool): memory-map the arrays read-only (default: True), otherwise read them into memory
+    RETURNS:
+        kind (str): content type
+        meta (dict): additional header entries
+        arrays (dict): arrays by name
+    """
+    with open(path, 'rb') as file:
+        prefix = file.read(len(_magic) + 1 + 8)
+        if prefix[:len(_magic)] != _magic:
+            raise ValueError(f"{path} is not a geometry storage file.")
+        version, header_len = struct.unpack('<BQ', prefix[len(_magic):])
+        if version > _version:
+            raise ValueError(f"Unsupported storage format version {version}")
+        header = json.loads(file.read(header_len).decode('utf-8'))
+    data_start = -(-(len(prefix) + header_len) // _alignment) * _alignment
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype, shape = np.dtype(entry['dtype']), tuple(entry['shape'])
+        if mmap and np.prod(shape) > 0:
+            arrays[name] = np.asarray(np.memmap(path, dtype=dtype, mode='r', offset=data_start + entry['offset'],
+                                                shape=shape))
+        else:
+            arrays[name] = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+                                       offset=data_start + entry['offset']).reshape(shape)
+    return header['kind'], header['meta'], arrays
+
+def _check_kind(path: str, kind: str, expected: str):
+    """Raises ValueError if a file holds different content than expected."""
+    if kind != expected:
+        raise ValueError(f"{path} contains {kind}, expected {expected}.")
+
+def save_points(path: str, points, dtype: str = '<f8'):
+    """Writes a point collection.
+    ARGS:
+        path (str): path to the file
+        points: ndarray of shape (N, 3) or list of Point objects
+        dtype (str): numpy data type of the stored coordinates (default: '<f8'), e.g. '<f4' for half the size
+    """
+    save(path, 'points', points=utility.vec_array(points).astype(dtype, copy=False))
+
+def load_points(path: str, mmap: bool = True) -> np.ndarray:
+    """Opens a point collection written by save_points.
+    ARGS:
+        path (str): path to the file
+        mmap (bool): memory-map the file (default: True)
+    RETURNS:
+        points (np.ndarray): point coordinates of shape (N, 3), read-only if memory-mapped
+    """
+    kind, _, arrays = load(path, mmap)
+    _check_kind(path, kind, 'points')
+    return arrays['points']
+
+def save_mesh(path: str, mesh, include_tree: bool = True):
+    """Writes an indexed mesh, optionally with its bounding volume hierarchy (built if not yet available).
+    ARGS:
+        path (str): path to the file
+        mesh: IndexedMesh or list of Face objects
+        include_tree (bool): store the bounding volume hierarchy as well (default: True)
+    """
+    mesh = as_indexed_mesh(mesh)
+    arrays = {'vertices': mesh.vertices, 'triangles': mesh.triangles}
+    meta = {}
+    if include_tree:
+        arrays.update({'tree_' + name: a for name, a in mesh.tree.arrays().items()})
+        meta['leaf_size'] = mesh.tree.leaf_size
+    save(path, 'mesh', meta, **arrays)
+
+def load_mesh(path: str, mmap: bool = True) -> IndexedMesh:
+    """Opens an indexed mesh written by save_mesh, including its bounding volume hierarchy if stored.
+    Memory-mapped meshes are read lazily, the vertex indices are not checked on loading.
+    ARGS:
+        path (str): path to the file
+        mmap (bool): memory-map the file (default: True)
+    RETURNS:
+        mesh (IndexedMesh): mesh on read-only arrays if memory-mapped
+    """
+    kind, meta, arrays = load(path, mmap)
+    _check_kind(path, kind, 'mesh')
+    mesh = IndexedMesh(arrays['vertices'], arrays['triangles'], check=False)
+    tree_arrays = {name[len('tree_'):]: a for name, a in arrays.items() if name.startswith('tree_')}
+    if tree_arrays:
+        mesh.tree = spatial.AABBTree.from_arrays(tree_arrays, meta['leaf_size'])
+    return mesh
+
+def save_primitives(path: str, primitives: list):
+    """Writes a collection of primitives of one type: Point, Vertex, UVPoint, Line, Edge, Plane, Face or UVTriangle.
+    ARGS:
+        path (str): path to the file
+        primitives (list): primitive objects, all of the same type
+    """
+    if not len(primitives):
+        raise ValueError("Cannot determine the type of an empty primitive collection.")
+    name = type(primitives[0]).__name__
+    if name not in _primitives:
+        raise ValueError(f"Unsupported primitive type {name}")
+    cls, to_arrays, _ = _primitives[name]
+    for primitive in primitives:
+        utility.argcheck_type([cls], primitive)
+    data = np.array([to_arrays(primitive) for primitive in primitives], dtype=float)
+    save(path, 'primitives', {'type': name}, primitives=data)
+
+def load_primitives(path: str, as_objects: bool = False, mmap: bool = True):
+    """Opens a primitive collection written by save_primitives.
+    ARGS:
+        path (str): path to the file
+        as_objects (bool): create primitive objects (default: False), otherwise return the stacked array
+        mmap (bool): memory-map the file (default: True)
+    RETURNS:
+        primitives: ndarray of shape (N, K, D) with K defining points of dimension D per primitive,
+            or list of primitive objects
+    """
+    kind, meta, arrays = load(path, mmap)
+    _check_kind(path, kind, 'primitives')
+    data = arrays['primitives']
+    if not as_objects:
+        return data
+    _, _, from_arrays = _primitives[meta['type']]
+    primitives = [from_arrays(np.array(row)) for row in data]
+    return primitives
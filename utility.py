@@ -6,11 +6,17 @@ Licensed under the Mozilla Public License 2.0
 (see attached License.txt or https://www.mozilla.org/en-US/MPL/2.0/)
 """
 
+from numbers import Integral
+from numbers import Real
+
 from numpy import ndarray
+from numpy import asarray
+from numpy import integer
+from numpy import floating
 
 
 # conversion from point to vector representation
-vec = lambda constr: constr if type(constr) == ndarray else constr.coords
+vec = lambda constr: constr if isinstance(constr, ndarray) else constr.coords
 # unpack list to comma-separated string
 expand = lambda l: ", ".join(t.__name__ for t in l)
 
@@ -72,17 +78,67 @@ def argcheck_type(types: list, argument) -> bool:
     else:
         return True
 
+def argcheck_scalar(argument, integral: bool = False) -> bool:
+    """Checks whether argument is a real scalar, including all numpy scalar types. Booleans are rejected.
+    ARGS:
+        argument: argument to be checked
+        integral (bool): require an integer (default: False)
+    RETURNS:
+        True if argument is a real (integral) scalar
+    """
+    types = (Integral, integer) if integral else (Real, integer, floating)
+    if isinstance(argument, bool) or not isinstance(argument, types):
+        raise ValueError(f"Type mismatch in argument. Expected {'integer' if integral else 'real'} scalar, "
+                         f"got {type(argument).__name__}")
+    else:
+        return True
+
+def argcheck_param(argument) -> bool:
+    """Checks whether argument is a real scalar or an ndarray of real numbers, e.g. curve or surface parameters.
+    ARGS:
+        argument: argument to be checked
+    RETURNS:
+        True if argument is a real scalar or array
+    """
+    if isinstance(argument, ndarray):
+        if argument.dtype.kind not in 'iuf':
+            raise ValueError(f"Expected array of real numbers, got dtype {argument.dtype}")
+        return True
+    return argcheck_scalar(argument)
+
 def argcheck_minmax(min, max, argument) -> bool:
     """Checks whether argument is within minimum and maximum values.
     ARGS:
         min: Minimum value
         max: Maximum value
-        argument: argument to be checked
+        argument: argument to be checked, scalar or ndarray (all elements are checked)
     RETURNS:
         True if argument is within bounds
     """
-    arg_within_bounds = min <= argument <= max
+    argument = asarray(argument)
+    arg_within_bounds = ((min <= argument) & (argument <= max)).all()
     if not arg_within_bounds:
-        raise ValueError(f"Argument out of bounds. Minimum: {min}, maximum: {max}, received: {argument}")
+        received = argument if argument.ndim == 0 else f"{argument.min()} to {argument.max()}"
+        raise ValueError(f"Argument out of bounds. Minimum: {min}, maximum: {max}, received: {received}")
+    else:
+        return True
+
+def vec_array(points, dim: int = 3) -> ndarray:
+    """Converts a collection of points to a 2D array of coordinates.
+    ARGS:
+        points: ndarray of shape (N, dim) or (dim,), or iterable of Point objects and/or ndarrays
+        dim (int): required dimension of each point (default: 3)
+    RETURNS:
+        coords (ndarray): float array of shape (N, dim)
+    """
+    if isinstance(points, ndarray):
+        coords = asarray(points, dtype=float)
     else:
-        return True
\ No newline at end of file
+        coords = asarray([vec(p) for p in points], dtype=float)
+    if coords.size == 0:
+        coords = coords.reshape(0, dim)
+    elif coords.ndim == 1 and coords.size == dim:
+        coords = coords.reshape(1, dim)
+    if coords.ndim != 2 or coords.shape[1] != dim:
+        raise ValueError(f"Expected array of shape (N, {dim}), got {coords.shape}")
+    return coords
@@ -87,14 +87,14 @@ class UVTriangle:
         self.__point_a = utility.vec(point_0)
         self.__point_b = utility.vec(point_1)
         self.__point_c = utility.vec(point_2)
-        self.__edge_a = UVLine(self.__point_a, self.__point_b)
-        self.__edge_b = UVLine(self.__point_b, self.__point_c)
-        self.__edge_c = UVLine(self.__point_c, self.__point_a)
+        self.__edge_a = UVLine(self.__point_a, self.__point_b, 'point')
+        self.__edge_b = UVLine(self.__point_b, self.__point_c, 'point')
+        self.__edge_c = UVLine(self.__point_c, self.__point_a, 'point')
 
     def __recalc_edges(self):
-        self.__edge_a = UVLine(self.__point_a, self.__point_b)
-        self.__edge_b = UVLine(self.__point_b, self.__point_c)
-        self.__edge_c = UVLine(self.__point_c, self.__point_a)
+        self.__edge_a = UVLine(self.__point_a, self.__point_b, 'point')
+        self.__edge_b = UVLine(self.__point_b, self.__point_c, 'point')
+        self.__edge_c = UVLine(self.__point_c, self.__point_a, 'point')
 
     @property
     def point_a(self):
@@ -104,7 +104,7 @@ class UVTriangle:
     def point_a(self, new_point):
         utility.argcheck_dim(self._dimension, new_point)
         utility.argcheck_type(self._argtypes_point, new_point)
-        self.__point_a = vec(new_point)
+        self.__point_a = utility.vec(new_point)
         self.__recalc_edges()
 
     @property
@@ -115,7 +115,7 @@ class UVTriangle:
     def point_b(self, new_point):
         utility.argcheck_dim(self._dimension, new_point)
         utility.argcheck_type(self._argtypes_point, new_point)
-        self.__point_b = vec(new_point)
+        self.__point_b = utility.vec(new_point)
         self.__recalc_edges()
 
     @property
@@ -126,7 +126,7 @@ class UVTriangle:
     def point_c(self, new_point):
         utility.argcheck_dim(self._dimension, new_point)
         utility.argcheck_type(self._argtypes_point, new_point)
-        self.__point_c = vec(new_point)
+        self.__point_c = utility.vec(new_point)
         self.__recalc_edges()
 
     @property
@@ -0,0 +1,295 @@
+"""Volumetric operations on closed triangle meshes: inside tests, voxelization and signed distance fields.
+
+Copyright (c) 2020 N.Wichmann
+
+Licensed under the Mozilla Public License 2.0
+(see attached License.txt or https://www.mozilla.org/en-US/MPL/2.0/)
+"""
+
+import numpy as np
+import utility
+import calc
+
+from meshtypes import IndexedMesh
+from meshtypes import as_indexed_mesh
+
+
+def _vertical_crossings(mesh: IndexedMesh, face_ids: np.ndarray, xy: np.ndarray) -> tuple:
+    """Intersects vertical rays with faces of a mesh.
+    Rays hitting an edge or vertex shared by several faces are counted for exactly one of them: edge functions
+    are evaluated in a direction given by the vertex indices and ties are resolved with a top-left rule.
+    ARGS:
+        mesh (IndexedMesh): mesh containing the faces
+        face_ids (np.ndarray): face indices of shape (K,)
+        xy (np.ndarray): ray positions in the XY plane of shape (K, 2)
+    RETURNS:
+        hit (np.ndarray): True where the ray crosses the face, shape (K,)
+        z (np.ndarray): Z coordinate of the crossing, shape (K,), only valid where hit
+    """
+    tri = mesh.triangles[face_ids]
+    verts = mesh.vertices
+    edge_val = []
+    for i0, i1 in ((1, 2), (2, 0), (0, 1)):
+        # edge opposite to corner i, evaluated from the vertex with the lower index
+        lo = np.minimum(tri[:, i0], tri[:, i1])
+        hi = np.maximum(tri[:, i0], tri[:, i1])
+        sign = np.where(tri[:, i0] < tri[:, i1], 1.0, -1.0)
+        v_lo, v_hi = verts[lo], verts[hi]
+        dx, dy = v_hi[:, 0] - v_lo[:, 0], v_hi[:, 1] - v_lo[:, 1]
+        e = dx * (xy[:, 1] - v_lo[:, 1]) - dy * (xy[:, 0] - v_lo[:, 0])
+        top_left = (dy > 0) | ((dy == 0) & (dx < 0))
+        edge_val.append((sign * e, np.where(sign > 0, top_left, ~top_left)))
+    area = edge_val[0][0] + edge_val[1][0] + edge_val[2][0]
+    # faces projected clockwise are handled by flipping all edge functions
+    orient = np.where(area < 0, -1.0, 1.0)
+    hit = area != 0
+    for e, tie in edge_val:
+        e = orient * e
+        hit &= (e > 0) | ((e == 0) & np.where(orient > 0, tie, ~tie))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (edge_val[0][0] * verts[tri[:, 0], 2] + edge_val[1][0] * verts[tri[:, 1], 2] +
+             edge_val[2][0] * verts[tri[:, 2], 2]) / area
+    return hit, z
+
+def _expand_ranges(index_min: np.ndarray, index_max: np.ndarray, chunk_size: int):
+    """Enumerates all integer grid indices within per-face index boxes, in chunks.
+    ARGS:
+        index_min, index_max (np.ndarray): inclusive index bounds per face, shape (F, D)
+        chunk_size (int): approximate number of (face, index) pairs per chunk
+    YIELDS:
+        face_ids (np.ndarray): face indices of shape (K,)
+        indices (np.ndarray): grid indices of shape (K, D)
+    """
+    extent = np.maximum(index_max - index_min + 1, 0)
+    n_pairs = np.prod(extent, axis=1)
+    pair_end = np.cumsum(n_pairs)
+    f0 = 0
+    while f0 < len(n_pairs):
+        f1 = max(int(np.searchsorted(pair_end, pair_end[f0] - n_pairs[f0] + chunk_size, 'right')), f0 + 1)
+        face_ids = np.repeat(np.arange(f0, f1), n_pairs[f0:f1])
+        local = np.arange(len(face_ids)) - np.repeat(np.cumsum(n_pairs[f0:f1]) - n_pairs[f0:f1], n_pairs[f0:f1])
+        indices = np.empty((len(face_ids), index_min.shape[1]), dtype=np.int64)
+        for d in range(index_min.shape[1]):
+            indices[:, d] = index_min[face_ids, d] + local % extent[face_ids, d]
+            local = local // extent[face_ids, d]
+        yield face_ids, indices
+        f0 = f1
+
+def winding_number(points, mesh, chunk_size: int = 4194304) -> np.ndarray:
+    """Calculates the generalized winding number of a mesh for a batch of points.
+    The winding number is the sum of the solid angles of all faces as seen from the point, divided by 4 pi.
+    It is 1 inside and 0 outside of a closed, outward oriented mesh. Evaluates all point-face pairs.
+    ARGS:
+        points: query points, ndarray of shape (N, 3) or list of Point objects
+        mesh: IndexedMesh or list of Face objects
+        chunk_size (int): number of point-face pairs evaluated at once, bounds memory use (default: 4194304)
+    RETURNS:
+        winding (np.ndarray): winding numbers of shape (N,)
+    """
+    p = utility.vec_array(points)
+    mesh = as_indexed_mesh(mesh)
+    tri_a, tri_b, tri_c = mesh.corners
+    winding = np.zeros(len(p))
+    step = max(1, chunk_size // max(1, len(tri_a)))
+    norm = lambda v: np.sqrt(np.einsum('ijk,ijk->ij', v, v))
+    dot = lambda u, v: np.einsum('ijk,ijk->ij', u, v)
+    for c0 in range(0, len(p), step):
+        q = p[c0:c0 + step, None, :]
+        a, b, c = tri_a - q, tri_b - q, tri_c - q
+        la, lb, lc = norm(a), norm(b), norm(c)
+        num = dot(a, np.cross(b, c))
+        den = la * lb * lc + dot(a, b) * lc + dot(a, c) * lb + dot(b, c) * la
+        winding[c0:c0 + step] = np.sum(np.arctan2(num, den), axis=1) / (2.0 * np.pi)
+    return winding
+
+def inside_mesh(points, mesh, method: str = 'winding', chunk_size: int = 4194304) -> np.ndarray:
+    """Checks whether points are inside the solid bounded by a closed mesh.
+    Both methods evaluate all point-face pairs and are meant for validation and small batches;
+    use SignedDistanceGrid for large batches.
+    ARGS:
+        points: query points, ndarray of shape (N, 3) or list of Point objects
+        mesh: IndexedMesh or list of Face objects
+        method (str): 'winding' for generalized winding number or 'parity' for counting crossings of a ray in +Z
+        chunk_size (int): number of point-face pairs evaluated at once, bounds memory use (default: 4194304)
+    RETURNS:
+        inside (np.ndarray): True for points inside the mesh, shape (N,)
+    """
+    method = utility.modecheck_type(method)
+    p = utility.vec_array(points)
+    mesh = as_indexed_mesh(mesh)
+    if method == 'winding':
+        inside = winding_number(p, mesh, chunk_size) > 0.5
+    elif method == 'parity':
+        n_faces = len(mesh.triangles)
+        crossings = np.zeros(len(p), dtype=np.int64)
+        step = max(1, chunk_size // max(1, n_faces))
+        for c0 in range(0, len(p), step):
+            q = p[c0:c0 + step]
+            point_ids = np.repeat(np.arange(len(q)), n_faces)
+            face_ids = np.tile(np.arange(n_faces), len(q))
+            hit, z = _vertical_crossings(mesh, face_ids, q[point_ids, :2])
+            hit &= z > q[point_ids, 2]
+            crossings[c0:c0 + step] = np.bincount(point_ids[hit], minlength=len(q))
+        inside = crossings % 2 == 1
+    else:
+        raise ValueError(f"inside_mesh parameter \'method\' takes either \'winding\' or \'parity\' as argument. "
+                         f"Unknown argument {method}")
+    return inside
+
+
+class SignedDistanceGrid:
+    """Regular grid of signed distances to a closed mesh, negative inside"""
+    _dimension = 3
+
+    def __init__(self, mesh, spacing: float, padding: float = None, band: float = 2.0, sweeps: int = 2,
+                 chunk_size: int = 4194304):
+        """Voxelizes a closed mesh. Grid nodes are classified inside/outside on creation,
+        the distance values are calculated on first access.
+        ARGS:
+            mesh: IndexedMesh or list of Face objects, closed and consistently oriented
+            spacing (float): distance between grid nodes
+            padding (float): margin added around the mesh bounding box (default: 2 * spacing)
+            band (float): width of the narrow band with exact distances around the faces in grid spacings (default: 2)
+            sweeps (int): number of sweep cycles propagating distances away from the band (default: 2)
+            chunk_size (int): number of face-node pairs processed at once, bounds memory use (default: 4194304)
+        """
+        utility.argcheck_scalar(spacing)
+        if spacing <= 0:
+            raise ValueError("Grid spacing must be positive.")
+        self.__mesh = as_indexed_mesh(mesh)
+        self.__spacing = float(spacing)
+        self.__band = float(band)
+        self.__sweeps = int(sweeps)
+        self.__chunk_size = chunk_size
+        padding = 2.0 * self.__spacing if padding is None else padding
+        v = self.__mesh.vertices
+        self.__origin = v.min(axis=0) - padding
+        self.__shape = tuple(int(n) for n in np.ceil((v.max(axis=0) + padding - self.__origin) / spacing) + 1)
+        self.__occupancy = self.__voxelize()
+        self.__values = None
+
+    def __voxelize(self) -> np.ndarray:
+        """Classifies all grid nodes by the parity of face crossings along every grid column in +Z."""
+        nx, ny, nz = self.__shape
+        h = self.__spacing
+        tri_min, tri_max = self.__mesh.bounds
+        # ranges are widened by one column, since origin + col * h may round differently than the division;
+        # the edge functions decide about the columns at the border
+        col_min = np.maximum(np.ceil((tri_min[:, :2] - self.__origin[:2]) / h) - 1, 0).astype(np.int64)
+        col_max = np.minimum(np.floor((tri_max[:, :2] - self.__origin[:2]) / h) + 1, [nx - 1, ny - 1]).astype(np.int64)
+
+        # crossing counts per column, a crossing toggles all nodes above it; uint8 wraps with even modulus
+        toggles = np.zeros((nx * ny, nz + 1), dtype=np.uint8)
+        for faces, cols in _expand_ranges(col_min, col_max, self.__chunk_size):
+            hit, z = _vertical_crossings(self.__mesh, faces, self.__origin[:2] + cols * h)
+            z = z[hit]
+            k = np.floor((z - self.__origin[2]) / h).astype(np.int64) + 1
+            # first node above the crossing, evaluated at the node positions themselves
+            k -= self.__origin[2] + (k - 1) * h > z
+            k += self.__origin[2] + k * h <= z
+            k = np.clip(k, 0, nz)
+            np.add.at(toggles, (cols[hit, 0] * ny + cols[hit, 1], k), 1)
+        occupancy = (np.cumsum(toggles, axis=1, dtype=np.uint8)[:, :nz] % 2).astype(bool)
+        return occupancy.reshape(nx, ny, nz)
+
+    def __distance_field(self) -> np.ndarray:
+        """Calculates unsigned distances at all grid nodes.
+        Nodes within the narrow band around the faces get exact distances. Their closest points are then
+        propagated through the grid in sweeps along all axes in both directions, one slice of nodes at a time."""
+        shape = np.array(self.__shape)
+        h = self.__spacing
+        closest = np.full(tuple(shape) + (self._dimension,), np.nan)
+        tri_min, tri_max = self.__mesh.bounds
+        node_min = np.maximum(np.ceil((tri_min - self.__origin) / h - self.__band), 0).astype(np.int64)
+        node_max = np.minimum(np.floor((tri_max - self.__origin) / h + self.__band), shape - 1).astype(np.int64)
+        band = np.zeros(self.__shape, dtype=bool)
+        for _, nodes in _expand_ranges(node_min, node_max, self.__chunk_size):
+            band[nodes[:, 0], nodes[:, 1], nodes[:, 2]] = True
+        band_nodes = np.argwhere(band)
+        _, closest[band], _ = calc.closest_point_mesh(self.__origin + band_nodes * h, self.__mesh)
+
+        dist = np.full(self.__shape, np.inf)
+        dist[band] = np.linalg.norm(self.__origin + band_nodes * h - closest[band], axis=1)
+        grid = [self.__origin[d] + np.arange(shape[d]) * h for d in range(self._dimension)]
+        for _ in range(self.__sweeps):
+            for axis in range(self._dimension):
+                # move the sweep axis to the front, so that slices are views along the first dimension
+                d_view, cp_view = np.moveaxis(dist, axis, 0), np.moveaxis(closest, axis, 0)
+                plane_axes = [grid[d] for d in range(self._dimension) if d != axis]
+                plane = np.stack(np.meshgrid(*plane_axes, indexing='ij'), axis=-1)
+                node = np.empty(plane.shape[:-1] + (self._dimension,))
+                node[..., [d for d in range(self._dimension) if d != axis]] = plane
+                for order in (range(1, shape[axis]), range(shape[axis] - 2, -1, -1)):
+                    step = 1 if order.step > 0 else -1
+                    for s in order:
+                        node[..., axis] = grid[axis][s]
+                        # candidates are the closest points of the 3x3 neighborhood in the previous slice
+                        prev = np.pad(cp_view[s - step], ((1, 1), (1, 1), (0, 0)), constant_values=np.nan)
+                        for di, dj in np.ndindex(3, 3):
+                            candidate = prev[di:di + node.shape[0], dj:dj + node.shape[1]]
+                            d_new = np.linalg.norm(node - candidate, axis=-1)
+                            update = d_new < d_view[s]
+                            d_view[s][update] = d_new[update]
+                            cp_view[s][update] = candidate[update]
+        return dist
+
+    @property
+    def mesh(self) -> IndexedMesh:
+        return self.__mesh
+
+    @property
+    def origin(self) -> np.ndarray:
+        return self.__origin
+
+    @property
+    def spacing(self) -> float:
+        return self.__spacing
+
+    @property
+    def shape(self) -> tuple:
+        return self.__shape
+
+    @property
+    def occupancy(self) -> np.ndarray:
+        """Boolean array of the grid shape, True for nodes inside the mesh"""
+        return self.__occupancy
+
+    @property
+    def values(self) -> np.ndarray:
+        """Signed distances at the grid nodes, negative inside; calculated on first access"""
+        if self.__values is None:
+            values = self.__distance_field()
+            values[self.__occupancy] *= -1.0
+            self.__values = values
+        return self.__values
+
+    def sample(self, points) -> np.ndarray:
+        """Interpolates the signed distance trilinearly at a batch of points.
+        Points outside of the grid are clamped to the grid boundary.
+        ARGS:
+            points: query points, ndarray of shape (N, 3) or list of Point objects
+        RETURNS:
+            dist (np.ndarray): interpolated signed distances of shape (N,)
+        """
+        p = utility.vec_array(points)
+        upper = np.array(self.__shape) - 1
+        g = np.clip((p - self.__origin) / self.__spacing, 0, upper)
+        base = np.minimum(np.floor(g).astype(np.int64), np.maximum(upper - 1, 0))
+        t = g - base
+        values = self.values
+        dist = np.zeros(len(p))
+        for corner in np.ndindex(2, 2, 2):
+            offset = np.minimum(base + corner, upper)
+            weight = np.prod(np.where(corner, t, 1.0 - t), axis=1)
+            dist += weight * values[offset[:, 0], offset[:, 1], offset[:, 2]]
+        return dist
+
+    def inside(self, points) -> np.ndarray:
+        """Classifies a batch of points as inside of the mesh by the sign of the interpolated distance.
+        ARGS:
+            points: query points, ndarray of shape (N, 3) or list of Point objects
+        RETURNS:
+            inside (np.ndarray): True for points inside the mesh, shape (N,)
+        """
+        inside = self.sample(points) < 0
+        return inside